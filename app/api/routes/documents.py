@@ -1,91 +1,200 @@
-import os
-from typing import List, Optional, Union
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
-from google.cloud import firestore, storage
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response, BackgroundTasks
+from fastapi.responses import ORJSONResponse
 import logging
 
-from app.database import get_firestore_client, get_storage_client
-from app.schemas.document import DocumentResponse, FolderItem, FileItem, AISummaryResponse, DocumentSummaryCreate, DocumentSummaryResponse, AIInsightsResponse
-from app.services.document_service import DocumentService
-from app.services.summarize_service import SummarizeService
-from app.config import settings
+from app.schemas.document import DocumentResponse, DocumentUploadBatchInitiate, DocumentUploadInitiate, DocumentUploadInitiateResponse, AISummaryResponse, DocumentSummaryBatchCreate, AIInsightsResponse
+from app.services.document_service import DocumentService, get_document_service
 
 logger = logging.getLogger("app.document_service")
 
 router = APIRouter()
 
-@router.post("/documents/create", response_model=DocumentResponse)
+@router.post(
+    "/documents/create",
+    response_model=DocumentResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file", "meta_data"],
+                        "properties": {
+                            "file": {"type": "string", "format": "binary"},
+                            "meta_data": {"type": "string"},
+                        },
+                    }
+                }
+            },
+        }
+    },
+)
 async def create_document(
+    request: Request,
     background_tasks: BackgroundTasks,
-    meta_data: str = Form(...),
-    file: UploadFile = File(...),
-    firestore_client = Depends(get_firestore_client),
-    storage_client = Depends(get_storage_client)
+    service: DocumentService = Depends(get_document_service)
 ):
     """Upload new document.
 
     Expected multipart/form-data keys:
       - file (the uploaded file)
       - meta_data (JSON string containing optional current_folder_id)
+
+    The request body is consumed as a stream and forwarded to storage as it
+    arrives instead of being buffered through UploadFile.
     """
 
-    logger.info("[documents] Starting upload for file '%s' (content_type=%s)", file.filename, file.content_type)
+    logger.info("[documents] Starting streamed upload (content_length=%s)", request.headers.get("content-length"))
     
-    service = DocumentService()
     document = await service.create_document(
-        file=file, 
-        meta_data=meta_data,
+        headers=request.headers,
+        stream=request.stream(),
         background_tasks=background_tasks
     )
     return document
 
-@router.get("/documents", response_model=List[Union[FolderItem, FileItem]])
+@router.post("/documents/uploads", response_model=DocumentUploadInitiateResponse)
+async def create_document_initiate(
+    upload: DocumentUploadInitiate,
+    service: DocumentService = Depends(get_document_service)
+):
+    """Start a direct-to-storage upload.
+
+    The client PUTs the file to the returned `upload_url` (with the same
+    Content-Type it declared here), then calls /documents/{id}/finalize.
+    """
+    logger.info("[documents] Initiating direct upload for '%s'", upload.original_filename)
+
+    return await service.create_document_initiate(upload)
+
+
+@router.post("/documents/uploads/batch", response_model=List[DocumentUploadInitiateResponse])
+async def create_documents_initiate(
+    batch: DocumentUploadBatchInitiate,
+    service: DocumentService = Depends(get_document_service)
+):
+    """Start direct-to-storage uploads for several files (up to 100).
+
+    Returns one upload URL per file, in request order; finalize each document
+    after its PUT succeeds.
+    """
+    logger.info("[documents] Initiating %d direct uploads", len(batch.uploads))
+
+    return await service.create_documents_initiate(batch.uploads)
+
+
+@router.post("/documents/{document_id}/finalize", response_model=DocumentResponse)
+async def create_document_finalize(
+    document_id: str,
+    background_tasks: BackgroundTasks,
+    service: DocumentService = Depends(get_document_service)
+):
+    """Activate a document whose file was uploaded with a signed PUT URL."""
+    logger.info("[documents] Finalizing direct upload for document_id=%s", document_id)
+
+    return await service.create_document_finalize(document_id, background_tasks=background_tasks)
+
+
+@router.get("/documents", response_model=None)
 async def get_documents(
     folder_id: Optional[str] = None,
-    firestore_client = Depends(get_firestore_client),
-    storage_client = Depends(get_storage_client)
+    no_cache: bool = False,
+    service: DocumentService = Depends(get_document_service)
 ):
     """Get hierarchical folder structure with documents.
     
     Args:
         folder_id: Optional folder ID to get specific folder structure
+        no_cache: Skip the short-lived tree cache and read straight from Firestore
         
     Returns:
-        FolderItem: Hierarchical folder structure with nested files and folders
+        ORJSONResponse: Hierarchical folder structure with nested files and folders,
+        shaped like FolderItem/FileItem but serialized without response_model validation
     """
     logger.info("[documents] Getting folder structure for folder_id=%s", folder_id)
     
-    service = DocumentService()
-    items = await service.get_documents()
-    return items
+    items = await service.get_documents(no_cache=no_cache)
+    return ORJSONResponse(items)
+
+
+@router.get("/folders/{folder_id}/documents", response_model=None)
+async def list_folder_documents(
+    folder_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    service: DocumentService = Depends(get_document_service)
+):
+    """Get one page of the documents in a folder, newest first.
+
+    Args:
+        folder_id: The folder to list
+        cursor: `next_cursor` from the previous page; omit for the first page
+        limit: Maximum number of documents to return
+
+    Returns:
+        ORJSONResponse: {"items": [...FileItem-shaped dicts], "next_cursor": str | null}
+    """
+    logger.info("[documents] Listing documents for folder_id=%s (limit=%d)", folder_id, limit)
+
+    page = await service.list_folder_documents(folder_id, cursor=cursor, limit=limit)
+    return ORJSONResponse(page)
+
+
+@router.post("/documents/summaries/batch", status_code=202)
+async def generate_summaries_batch(
+    batch: DocumentSummaryBatchCreate,
+    background_tasks: BackgroundTasks,
+    service: DocumentService = Depends(get_document_service)
+):
+    """Regenerate summaries for up to 1000 documents in the background.
+
+    Uses the LLM batch API: half the cost of per-document calls, but results
+    can take hours. Poll each document's summary to see when it's done.
+    """
+    logger.info("[documents] Queueing batch summary generation for %d documents", len(batch.document_ids))
+
+    background_tasks.add_task(service.generate_summaries_batch, batch.document_ids)
+    return {"status": "queued", "document_ids": batch.document_ids}
 
 
 @router.get("/documents/{document_id}/summary", response_model=AISummaryResponse)
 async def get_document_summary(
     document_id: str,
-    firestore_client = Depends(get_firestore_client),
-    storage_client = Depends(get_storage_client)
+    response: Response,
+    background_tasks: BackgroundTasks,
+    wait: float = Query(0, ge=0, le=30),
+    service: DocumentService = Depends(get_document_service)
 ):
     """Get a summary of a specific document.
 
     Args:
         document_id: The ID of the document to retrieve
+        wait: Seconds to wait for an in-progress summary to finish before answering
+            (0 answers immediately)
 
     Returns:
-        DocumentResponse: The document summary
+        DocumentResponse: The document summary; 202 with a placeholder when
+        generation was just scheduled
     """
     logger.info("[documents] Getting summary for document_id=%s", document_id)
 
-    service = DocumentService()
-    document = await service.get_document_summary(document_id=document_id)
+    if wait:
+        document = await service.wait_for_summary(document_id=document_id, background_tasks=background_tasks, timeout=wait)
+    else:
+        document = await service.get_document_summary(document_id=document_id, background_tasks=background_tasks)
+    if background_tasks.tasks:
+        response.status_code = 202
     return document
 
 
 @router.get("/documents/{document_id}/insights", response_model=AIInsightsResponse)
 async def get_document_insights(
     document_id: str,
-    firestore_client = Depends(get_firestore_client),
-    storage_client = Depends(get_storage_client)
+    response: Response,
+    background_tasks: BackgroundTasks,
+    service: DocumentService = Depends(get_document_service)
 ):
     """Get insights for a specific document.
 
@@ -93,11 +202,13 @@ async def get_document_insights(
         document_id: The ID of the document to retrieve insights for
 
     Returns:
-        AIInsightsResponse: The document insights including extracted key information
+        AIInsightsResponse: The document insights including extracted key information;
+        202 with placeholder insights when generation was just scheduled
     """
     logger.info("[documents] Getting insights for document_id=%s", document_id)
 
-    service = DocumentService()
-    document = await service.get_document_insights(document_id=document_id)
+    document = await service.get_document_insights(document_id=document_id, background_tasks=background_tasks)
+    if background_tasks.tasks:
+        response.status_code = 202
     return document
 
@@ -1,5 +1,6 @@
 import os
-from typing import List
+from functools import cached_property
+from typing import FrozenSet, List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,17 +9,60 @@ class Settings(BaseSettings):
     FIREBASE_STORAGE_BUCKET: str = os.environ.get("FIREBASE_STORAGE_BUCKET", "")
     FIREBASE_CREDENTIALS_PATH: str = os.environ.get("FIREBASE_CREDENTIALS_PATH", 
                                                    os.path.join(os.path.dirname(__file__), "service-account.json"))
+    # Number of Firestore clients (one gRPC channel each) shared across requests
+    FIRESTORE_CHANNEL_POOL_SIZE: int = 8
+    # How long a built document tree is served from memory (0 disables caching)
+    DOC_TREE_CACHE_TTL_SEC: float = 5
+    # How long stored insights are served from memory by document id (0 disables caching)
+    INSIGHTS_CACHE_TTL_SEC: float = 300
+    # Same for stored summaries (0 disables caching)
+    SUMMARY_CACHE_TTL_SEC: float = 300
 
     # File upload settings
     MAX_FILE_SIZE_MB: int = 10
     ALLOWED_EXTENSIONS: str = ".pdf,.docx"
+    # Large uploads are split into parts of this size and uploaded in parallel
+    GCS_UPLOAD_CHUNK_MB: int = 8
+    GCS_UPLOAD_CONCURRENCY: int = 8
+    # Connection pool for the Cloud Storage HTTP session
+    STORAGE_POOL_CONNECTIONS: int = 32
+    STORAGE_POOL_MAXSIZE: int = 64
+    # Public buckets are served by plain object URLs, so download URLs aren't signed
+    GCS_BUCKET_IS_PUBLIC: bool = False
+    # Lifetime of the signed PUT URLs handed out for direct-to-storage uploads
+    UPLOAD_URL_EXPIRATION_MIN: int = 15
+    # Files initiated concurrently by one batch upload request
+    UPLOAD_BATCH_CONCURRENCY: int = 10
+    # Threads for blocking storage SDK calls
+    STORAGE_IO_WORKERS: int = 40
+    # Threads for sync FastAPI dependencies and the asyncio default executor
+    THREAD_POOL_SIZE: int = 64
+    # Worker processes that extract large PDFs page range by page range (0 = one per CPU)
+    PDF_PARSE_PROCESSES: int = 0
+    # Parsed document text kept in memory per process, revalidated by object generation (0 disables)
+    PARSED_TEXT_CACHE_MB: int = 64
     
   
     ANTHROPIC_API_KEY: str = os.environ.get("ANTHROPIC_API_KEY", "")
+    # Claude calls in flight per process, and the account's requests-per-minute
+    # limit to pace them under (0 disables pacing)
+    ANTHROPIC_MAX_CONCURRENCY: int = 8
+    ANTHROPIC_RPM: int = 0
+    # SDK retries (exponential backoff with jitter) on 429/overloaded responses
+    ANTHROPIC_MAX_RETRIES: int = 4
+    # How often a submitted Message Batch is checked for completion
+    LLM_BATCH_POLL_SEC: float = 30
+    # Long documents are summarized chunk by chunk; text past this many chunks is dropped
+    LLM_SUMMARY_MAX_CHUNKS: int = 16
     @property
     def allowed_extensions_list(self) -> List[str]:
         """Convert the comma-separated string to a list"""
         return [ext.strip() for ext in self.ALLOWED_EXTENSIONS.split(",")]
+
+    @cached_property
+    def allowed_extensions(self) -> FrozenSet[str]:
+        """Lowercased allowed extensions, parsed once for O(1) membership checks"""
+        return frozenset(ext.lower() for ext in self.allowed_extensions_list if ext)
     
     class Config:
         env_file = ".env"
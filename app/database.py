@@ -1,9 +1,16 @@
 # app/database.py
 
 import os
+from functools import lru_cache
+from itertools import cycle
 from urllib.parse import quote
+import asyncio
+import httpx
+from google.auth.transport.requests import AuthorizedSession, Request as AuthRequest
 from google.cloud import firestore, storage
 from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from app.config import settings
 
 # Use the credentials path from settings
@@ -17,18 +24,79 @@ if not FIREBASE_CREDENTIALS_PATH or not os.path.exists(FIREBASE_CREDENTIALS_PATH
 
 # Load credentials
 credentials = service_account.Credentials.from_service_account_file(FIREBASE_CREDENTIALS_PATH)
+# Service-account credentials hold the private key in memory, so V4 URL signing
+# is a local RSA operation (no token refresh or IAM signBlob call)
+signing_credentials = credentials
 
 # Firestore & Storage clients
-firestore_client = firestore.Client(credentials=credentials, project=credentials.project_id)
-storage_client = storage.Client(credentials=credentials, project=credentials.project_id)
+# Firestore uses the native asyncio client so handlers can await RPCs directly.
+# Each client owns a single gRPC channel, so a small pool of clients is handed
+# out round-robin to spread concurrent RPCs across channels.
+firestore_clients = [
+    firestore.AsyncClient(credentials=credentials, project=credentials.project_id)
+    for _ in range(max(1, settings.FIRESTORE_CHANNEL_POOL_SIZE))
+]
+firestore_client = firestore_clients[0]
+_firestore_client_cycle = cycle(firestore_clients)
+
+# Storage goes over HTTP; give it a session with a connection pool sized for
+# concurrent uploads/downloads instead of the urllib3 default of 10. Retry only
+# covers connection errors and idempotent requests (urllib3 default methods).
+storage_credentials = credentials.with_scopes(storage.Client.SCOPE)
+storage_http = AuthorizedSession(storage_credentials)
+storage_http.mount("https://", HTTPAdapter(
+    pool_connections=settings.STORAGE_POOL_CONNECTIONS,
+    pool_maxsize=settings.STORAGE_POOL_MAXSIZE,
+    max_retries=Retry(total=3, backoff_factor=0.1),
+))
+storage_client = storage.Client(credentials=credentials, project=credentials.project_id, _http=storage_http)
+
+# Object downloads go through an async HTTP/2 client so concurrent reads are
+# multiplexed over a few connections without tying up executor threads. The
+# transport retries failed connection attempts; app.utils.gcs retries writes on
+# transient statuses. Closed on app shutdown.
+storage_async_http = httpx.AsyncClient(
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        retries=2,
+    ),
+    timeout=httpx.Timeout(60.0, connect=10.0),
+)
 
 def get_firestore_client():
-    return firestore_client
+    return next(_firestore_client_cycle)
+
+@lru_cache(maxsize=1)
+def get_firestore_listener_client():
+    """Sync Firestore client for realtime listeners.
+
+    on_snapshot is only implemented by the sync client; it runs the watch stream
+    on its own background thread. Created on first use since most requests
+    never open a listener.
+    """
+    return firestore.Client(credentials=credentials, project=credentials.project_id)
 
 def get_storage_client():
     return storage_client
 
-def get_storage_bucket_public_url(filename):
+def get_storage_async_http():
+    return storage_async_http
+
+async def get_storage_auth_headers() -> dict:
+    """Bearer auth headers for Cloud Storage, refreshing the token off the loop when needed."""
+    if not storage_credentials.valid:
+        await asyncio.get_running_loop().run_in_executor(None, storage_credentials.refresh, AuthRequest())
+    return {"Authorization": f"Bearer {storage_credentials.token}"}
+
+# The bucket never changes at runtime, so the URL prefix is built once
+_URL_PREFIX = f"https://firebasestorage.googleapis.com/v0/b/{settings.FIREBASE_STORAGE_BUCKET}/o/"
+_URL_SUFFIX = "?alt=media"
+
+@lru_cache(maxsize=4096)
+def _quote_object_name(filename: str) -> str:
     # URL encode the filename to handle spaces and special characters
-    encoded_filename = quote(filename, safe='')
-    return f"https://firebasestorage.googleapis.com/v0/b/{settings.FIREBASE_STORAGE_BUCKET}/o/{encoded_filename}?alt=media"
+    return quote(filename, safe='')
+
+def get_storage_bucket_public_url(filename):
+    return _URL_PREFIX + _quote_object_name(filename) + _URL_SUFFIX
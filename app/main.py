@@ -1,11 +1,19 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import anyio.to_thread
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse
 import os
 import logging
 
 from app.api.routes import documents, folder
 from app.config import settings
+from app.database import storage_async_http
+from app.services.document_service import get_document_service
+from app.services.llm_service import anthropic_http
+from app.utils.pools import shutdown_process_pool
 
 
 
@@ -26,7 +34,8 @@ app = FastAPI(
     description="A document vault service",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -42,6 +51,23 @@ app.add_middleware(
 app.include_router(documents.router, prefix="/api/v1", tags=["documents"])
 app.include_router(folder.router, prefix="/api/v1", tags=["folders"])
 
+@app.on_event("startup")
+async def init_services():
+    # Sync dependencies run on anyio's threadpool (40 threads by default); size it
+    # and the asyncio default executor so request bursts don't queue for a thread
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREAD_POOL_SIZE
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.THREAD_POOL_SIZE, thread_name_prefix="io")
+    )
+    # Build the shared services up front so the first request doesn't pay for it
+    app.state.document_service = get_document_service()
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await storage_async_http.aclose()
+    await anthropic_http.aclose()
+    shutdown_process_pool()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional
 from pydantic import BaseModel
 
 class Document(BaseModel):
@@ -11,6 +11,7 @@ class Document(BaseModel):
     file_size: int
     file_path: str
     storage_path: Optional[str] = None  # Path in Supabase storage
+    content_hash: Optional[str] = None  # content_hashes key ("md5-<hex>") used to deduplicate uploads
     is_active: bool = True
     created_at: Optional[datetime] = None
     
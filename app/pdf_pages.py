@@ -0,0 +1,22 @@
+"""pdfplumber page extraction run in process-pool workers.
+
+Spawned workers import only this module to unpickle the submitted function, so
+it must not import anything from the app (app.utils pulls in the Firebase
+clients through app.database).
+"""
+
+import io
+from typing import List, Optional
+
+import pdfplumber
+
+
+def pdf_page_count(file_bytes: bytes) -> int:
+    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_pages(file_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """Text of pages [start, stop) of a PDF."""
+    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages[start:stop]]
@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional, List, Union, Dict, Any
-from pydantic import BaseModel, Field
+from typing import Optional, List, Union, Dict, Any, TypedDict
+from pydantic import BaseModel, Field, field_validator
 
 class DocumentBase(BaseModel):
     filename: str
@@ -25,6 +25,21 @@ class DocumentResponse(DocumentBase):
     class Config:
         from_attributes = True
 
+class DocumentUploadInitiate(BaseModel):
+    original_filename: str
+    content_type: str
+    current_folder_id: Optional[str] = None
+
+class DocumentUploadInitiateResponse(DocumentBase):
+    id: str
+    upload_url: str
+    # Headers the PUT to upload_url must carry besides Content-Type
+    upload_headers: Dict[str, str] = {}
+    expires_at: datetime
+
+class DocumentUploadBatchInitiate(BaseModel):
+    uploads: List[DocumentUploadInitiate] = Field(min_length=1, max_length=100)
+
 class AISummaryResponse(DocumentBase):
     id: str  # Changed from int to str for Firestore document IDs
     summary: Optional[str] = None
@@ -36,6 +51,9 @@ class DocumentSummaryCreate(BaseModel):
     document_id: str
     summary_text: str
 
+class DocumentSummaryBatchCreate(BaseModel):
+    document_ids: List[str] = Field(min_length=1, max_length=1000)
+
 class DocumentSummaryResponse(BaseModel):
     document_id: str
     summary_text: str
@@ -55,19 +73,39 @@ class ImportantDate(BaseModel):
     label: str
     date: str
 
+# LLM output is loosely shaped: a section of the wrong type is replaced by its
+# default instead of failing the whole insights object.
+def _list_or_empty(value: Any) -> Any:
+    return value if isinstance(value, list) else []
+
+def _dict_or_empty(value: Any) -> Any:
+    return value if isinstance(value, dict) else {}
+
 class FinancialData(BaseModel):
     amounts: List[FinancialAmount] = []
     dates: List[ImportantDate] = []
 
+    _lists = field_validator("amounts", "dates", mode="before")(_list_or_empty)
+
 class KeyInsights(BaseModel):
     financial_data: FinancialData = FinancialData()
     coverage_details: List[str] = []
     critical_information: List[str] = []
 
+    _financial_data = field_validator("financial_data", mode="before")(_dict_or_empty)
+    _lists = field_validator("coverage_details", "critical_information", mode="before")(_list_or_empty)
+
 class DocumentInsights(BaseModel):
-    document_type: str
+    document_type: str = "unknown"
     key_insights: KeyInsights = KeyInsights()
-    confidence_score: float = Field(ge=0.0, le=1.0)
+    confidence_score: float = Field(default=0.0, ge=0.0, le=1.0)
+
+    _key_insights = field_validator("key_insights", mode="before")(_dict_or_empty)
+
+    @field_validator("confidence_score", mode="before")
+    @classmethod
+    def _number_or_zero(cls, value: Any) -> Any:
+        return value if isinstance(value, (int, float)) else 0.0
 
 class AIInsightsResponse(DocumentBase):
     id: str
@@ -107,8 +145,27 @@ class FolderItem(BaseModel):
     # Use default_factory to avoid mutable default list being shared across instances
     children: List[Union['FolderItem', 'FileItem']] = Field(default_factory=list)
 
-# Enable forward references for recursive model
-FolderItem.model_rebuild()
+
+# Plain-dict shapes of FileItem/FolderItem used when building the document tree.
+# The tree is serialized straight through orjson, so no per-node model validation.
+class FileNode(TypedDict):
+    id: str
+    name: str
+    created_at: datetime
+    type: str
+    file_type: str
+    storage_path: Optional[str]
+
+class FolderNode(TypedDict):
+    id: str
+    name: str
+    created_at: datetime
+    type: str
+    children: List[Union['FolderNode', FileNode]]
+
+class FilePage(TypedDict):
+    items: List[FileNode]
+    next_cursor: Optional[str]
 
 # Aliases for backward compatibility
 Document = DocumentResponse
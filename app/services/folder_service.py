@@ -1,42 +1,54 @@
-from typing import Optional
+from typing import Any, Dict, Optional
 import uuid
 import logging
-import asyncio
-from datetime import datetime
 from fastapi import HTTPException
 from app.database import get_firestore_client
+from app.utils.tree_cache import document_tree_cache
+from google.cloud import firestore
 from google.cloud.exceptions import GoogleCloudError
 
 logger = logging.getLogger("app.folder_service")
 
 
 class FolderService:
-    def __init__(self):
-        self.firestore_client = get_firestore_client()
+    @property
+    def firestore_client(self):
+        # Resolved on each access so one shared instance still spreads RPCs over the client pool
+        return get_firestore_client()
+
+    def build_folder(self, folder_name: str, parent_folder_id: Optional[str] = None) -> Dict[str, Any]:
+        """Build the Firestore payload for a new folder without writing it.
+
+        Lets callers add the folder to a WriteBatch alongside related writes.
+        """
+        return {
+            "name": folder_name,
+            "parent_id": parent_folder_id,
+            "created_at": firestore.SERVER_TIMESTAMP,
+            "is_active": True,
+            "id": str(uuid.uuid4())
+        }
 
     async def create_folder(self, folder_name: str, parent_folder_id: Optional[str] = None) -> str:
         """Create a new folder in Firestore and return its ID."""
+        folder_data = await self.create_folder_record(folder_name, parent_folder_id)
+        return folder_data["id"]
+
+    async def create_folder_record(self, folder_name: str, parent_folder_id: Optional[str] = None) -> Dict[str, Any]:
+        """Create a new folder in Firestore and return the data that was written."""
         try:
-            folder_id = str(uuid.uuid4())
-            current_time = datetime.utcnow()
-            
-            folder_data = {
-                "name": folder_name,
-                "parent_id": parent_folder_id,
-                "created_at": current_time,
-                "is_active": True,
-                "id": folder_id
-            }
+            folder_data = self.build_folder(folder_name, parent_folder_id)
+            folder_id = folder_data["id"]
             
             logger.debug("Creating folder with data: %s", folder_data)
             folder_ref = self.firestore_client.collection("folders").document(folder_id)
             
-            # Use asyncio to run the synchronous Firestore operation
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, folder_ref.set, folder_data)
+            write_result = await folder_ref.set(folder_data)
+            document_tree_cache.invalidate()
             
             logger.info("Created folder '%s' with ID: %s", folder_name, folder_id)
-            return folder_id
+            # The server stamps created_at with the commit time, which the write result carries
+            return {**folder_data, "created_at": write_result.update_time}
             
         except GoogleCloudError as e:
             logger.exception("Google Cloud error creating folder")
@@ -44,3 +56,14 @@ class FolderService:
         except Exception as e:
             logger.exception("Unexpected error creating folder")
             raise HTTPException(status_code=500, detail=f"Failed to create folder: {e}")
+
+
+# Lazy singleton; the service holds no per-request state
+_folder_service_instance: Optional[FolderService] = None
+
+def get_folder_service() -> FolderService:
+    """Get the shared FolderService instance."""
+    global _folder_service_instance
+    if _folder_service_instance is None:
+        _folder_service_instance = FolderService()
+    return _folder_service_instance
@@ -1,25 +1,55 @@
 """Insights Service for document insights generation and storage."""
 
 import logging
-import json
-from datetime import datetime
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
 from fastapi import HTTPException
+from google.cloud import firestore
 from google.cloud.exceptions import GoogleCloudError
 
+from app.config import settings
 from app.database import get_firestore_client
-from app.schemas.document import DocumentInsightsResponse
-from app.services.llm_service import get_llm_service
+from app.schemas.document import DocumentInsights, DocumentInsightsResponse, KeyInsights
+from app.services.llm_service import INSIGHTS_PROMPT_VERSION, get_llm_service
+from app.utils.llm_cache import LLMResponseCache
 
 logger = logging.getLogger("app.insights_service")
 
+# Stored insights kept in memory per process, keyed by document id
+_INSIGHTS_CACHE_SIZE = 2048
+
+
+# Every fallback shares this empty structure; only the message differs
+_FALLBACK_INSIGHTS = DocumentInsights()
+
+
+def fallback_insights(message: str) -> DocumentInsights:
+    """Empty insights carrying `message` as their only critical information."""
+    return _FALLBACK_INSIGHTS.model_copy(
+        update={"key_insights": KeyInsights(critical_information=[message])}
+    )
+
+
+def _fallback_insights_json(message: str) -> str:
+    return fallback_insights(message).model_dump_json()
+
 
 class InsightsService:
     """Service for handling document insights generation and storage."""
     
     def __init__(self):
-        self.firestore_client = get_firestore_client()
         self.llm_service = get_llm_service()
+        # Identical summaries (e.g. re-uploads of the same file) reuse the model's earlier answer
+        self._response_cache = LLMResponseCache("insights")
+        # Repeat reads of the same document skip Firestore for a few minutes;
+        # entries are (expires_at, insights_json) and dropped on update/delete
+        self._insights_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    @property
+    def firestore_client(self):
+        # Resolved on each access so one shared instance still spreads RPCs over the client pool
+        return get_firestore_client()
 
     async def generate_document_insights(self, summary_text: str, filename: str) -> str:
         """Generate insights for a document summary using LLM service."""
@@ -30,23 +60,47 @@ class InsightsService:
                 logger.warning("No summary text provided for insights generation")
                 return "{}"
             
-            insights_json = self.llm_service.extract_insights(summary_text, filename)
+            cleaned_summary = summary_text.strip()
+            cache_key = LLMResponseCache.key(cleaned_summary, filename, self.llm_service.model, INSIGHTS_PROMPT_VERSION)
+            insights_json = await self._response_cache.get(cache_key)
+            if insights_json is not None:
+                logger.info("Reusing cached insights for identical summary (key=%s)", cache_key)
+                return insights_json
+
+            insights_json = await self.llm_service.request_insights(cleaned_summary, filename)
+            if insights_json is None:
+                # Heuristic output isn't cached so the model is retried next time
+                return self.llm_service.fallback_insights(cleaned_summary, filename)
+
+            await self._response_cache.set(cache_key, insights_json)
             logger.info("Successfully generated insights for document")
             return insights_json
             
         except Exception as e:
             logger.exception("Error generating document insights")
             # Return a fallback insights structure instead of raising
-            fallback_insights = {
-                "document_type": "unknown",
-                "key_insights": {
-                    "financial_data": {"amounts": [], "dates": []},
-                    "coverage_details": [],
-                    "critical_information": [f"Error generating insights: {str(e)}"]
-                },
-                "confidence_score": 0.0
-            }
-            return json.dumps(fallback_insights)
+            return _fallback_insights_json(f"Error generating insights: {str(e)}")
+
+    def cached_stored_insights(self, document_id: str) -> Optional[str]:
+        """Return the stored insights JSON held in memory for a document, if still fresh."""
+        entry = self._insights_cache.get(document_id)
+        if entry is None:
+            return None
+        expires_at, insights_json = entry
+        if expires_at <= time.monotonic():
+            del self._insights_cache[document_id]
+            return None
+        self._insights_cache.move_to_end(document_id)
+        return insights_json
+
+    def remember_stored_insights(self, document_id: str, insights_json: str) -> None:
+        """Cache stored insights JSON that was read outside this service."""
+        if settings.INSIGHTS_CACHE_TTL_SEC <= 0:
+            return
+        self._insights_cache[document_id] = (time.monotonic() + settings.INSIGHTS_CACHE_TTL_SEC, insights_json)
+        self._insights_cache.move_to_end(document_id)
+        while len(self._insights_cache) > _INSIGHTS_CACHE_SIZE:
+            self._insights_cache.popitem(last=False)
 
     async def store_document_insights(self, document_id: str, insights_json: str) -> DocumentInsightsResponse:
         """Store document insights in Firebase."""
@@ -56,18 +110,22 @@ class InsightsService:
             insights_data = {
                 "document_id": document_id,
                 "insights_data": insights_json,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
+                "created_at": firestore.SERVER_TIMESTAMP,
+                "updated_at": firestore.SERVER_TIMESTAMP
             }
             
             # Store in the document_insights collection
-            import asyncio
-            loop = asyncio.get_running_loop()
             insights_ref = self.firestore_client.collection("document_insights").document(document_id)
-            await loop.run_in_executor(None, insights_ref.set, insights_data)
+            write_result = await insights_ref.set(insights_data)
             
             logger.info("Successfully stored insights for document_id=%s", document_id)
-            return DocumentInsightsResponse(**insights_data)
+            # Both timestamps resolve to the commit time carried by the write result
+            return DocumentInsightsResponse(
+                document_id=document_id,
+                insights_data=insights_json,
+                created_at=write_result.update_time,
+                updated_at=write_result.update_time
+            )
             
         except GoogleCloudError as e:
             logger.exception("Google Cloud error storing document insights")
@@ -81,10 +139,8 @@ class InsightsService:
         try:
             logger.info("Retrieving stored insights for document_id=%s", document_id)
             
-            import asyncio
-            loop = asyncio.get_running_loop()
             insights_ref = self.firestore_client.collection("document_insights").document(document_id)
-            insights_doc = await loop.run_in_executor(None, insights_ref.get)
+            insights_doc = await insights_ref.get()
             
             if not insights_doc.exists:
                 logger.info("No stored insights found for document_id=%s", document_id)
@@ -104,20 +160,36 @@ class InsightsService:
     async def get_or_generate_insights(self, document_id: str, summary_text: str, filename: str) -> str:
         """Get existing insights or generate new ones from summary if not exists."""
         try:
+            cached = self.cached_stored_insights(document_id)
+            if cached is not None:
+                logger.info("Using cached insights for document_id=%s", document_id)
+                return cached
+
             # First try to get stored insights
             stored_insights = await self.get_stored_document_insights(document_id)
             if stored_insights:
                 logger.info("Using stored insights for document_id=%s", document_id)
+                self.remember_stored_insights(document_id, stored_insights.insights_data)
                 return stored_insights.insights_data
             
-            # Generate new insights from summary
             logger.info("No stored insights found, generating new ones for document_id=%s", document_id)
+            return await self.generate_and_store_insights(document_id, summary_text, filename)
+            
+        except Exception as e:
+            logger.exception("Error in get_or_generate_insights")
+            return _fallback_insights_json(f"Error processing insights: {str(e)}")
+
+    async def generate_and_store_insights(self, document_id: str, summary_text: str, filename: str) -> str:
+        """Generate insights from the summary and store them, for callers that
+        already know no insights are stored."""
+        try:
             insights_json = await self.generate_document_insights(summary_text, filename)
             
             if insights_json and insights_json != "{}":
                 # Store the generated insights for future use
                 try:
                     await self.store_document_insights(document_id, insights_json)
+                    self.remember_stored_insights(document_id, insights_json)
                     logger.info("Successfully stored generated insights for future use")
                 except Exception as e:
                     logger.warning("Failed to store generated insights: %s", e)
@@ -125,17 +197,8 @@ class InsightsService:
             return insights_json
             
         except Exception as e:
-            logger.exception("Error in get_or_generate_insights")
-            fallback_insights = {
-                "document_type": "unknown",
-                "key_insights": {
-                    "financial_data": {"amounts": [], "dates": []},
-                    "coverage_details": [],
-                    "critical_information": [f"Error processing insights: {str(e)}"]
-                },
-                "confidence_score": 0.0
-            }
-            return json.dumps(fallback_insights)
+            logger.exception("Error in generate_and_store_insights")
+            return _fallback_insights_json(f"Error processing insights: {str(e)}")
 
     async def update_document_insights(self, document_id: str, new_insights_json: str) -> DocumentInsightsResponse:
         """Update existing document insights."""
@@ -145,7 +208,7 @@ class InsightsService:
             insights_data = {
                 "document_id": document_id,
                 "insights_data": new_insights_json,
-                "updated_at": datetime.utcnow()
+                "updated_at": firestore.SERVER_TIMESTAMP
             }
             
             # Check if insights exist first
@@ -153,21 +216,24 @@ class InsightsService:
             if existing_insights:
                 # Update existing
                 insights_data["created_at"] = existing_insights.created_at
-                import asyncio
-                loop = asyncio.get_running_loop()
                 insights_ref = self.firestore_client.collection("document_insights").document(document_id)
-                await loop.run_in_executor(None, insights_ref.update, insights_data)
+                write_result = await insights_ref.update(insights_data)
                 logger.info("Successfully updated existing insights for document_id=%s", document_id)
             else:
                 # Create new if doesn't exist
-                insights_data["created_at"] = datetime.utcnow()
-                import asyncio
-                loop = asyncio.get_running_loop()
+                insights_data["created_at"] = firestore.SERVER_TIMESTAMP
                 insights_ref = self.firestore_client.collection("document_insights").document(document_id)
-                await loop.run_in_executor(None, insights_ref.set, insights_data)
+                write_result = await insights_ref.set(insights_data)
                 logger.info("Successfully created new insights for document_id=%s", document_id)
             
-            return DocumentInsightsResponse(**insights_data)
+            self._insights_cache.pop(document_id, None)
+            created_at = insights_data["created_at"]
+            return DocumentInsightsResponse(
+                document_id=document_id,
+                insights_data=new_insights_json,
+                created_at=write_result.update_time if created_at is firestore.SERVER_TIMESTAMP else created_at,
+                updated_at=write_result.update_time
+            )
             
         except GoogleCloudError as e:
             logger.exception("Google Cloud error updating document insights")
@@ -181,10 +247,9 @@ class InsightsService:
         try:
             logger.info("Deleting insights for document_id=%s", document_id)
             
-            import asyncio
-            loop = asyncio.get_running_loop()
             insights_ref = self.firestore_client.collection("document_insights").document(document_id)
-            await loop.run_in_executor(None, insights_ref.delete)
+            await insights_ref.delete()
+            self._insights_cache.pop(document_id, None)
             
             logger.info("Successfully deleted insights for document_id=%s", document_id)
             return True
@@ -197,7 +262,12 @@ class InsightsService:
             raise HTTPException(status_code=500, detail=f"Failed to delete document insights: {e}")
 
 
-# Convenience function to get insights service instance
+# Lazy singleton; the service holds no per-request state
+_insights_service_instance: Optional[InsightsService] = None
+
 def get_insights_service() -> InsightsService:
-    """Get an instance of the InsightsService."""
-    return InsightsService()
+    """Get the shared InsightsService instance."""
+    global _insights_service_instance
+    if _insights_service_instance is None:
+        _insights_service_instance = InsightsService()
+    return _insights_service_instance
@@ -11,12 +11,19 @@ fallback summarizer (rule-based) is used so the app can still run.
 
 from __future__ import annotations
 
-from fileinput import filename
-import os
+import asyncio
+import re
+import json
+import hashlib
 import logging
-from typing import Optional
+import threading
+import httpx
+from typing import Dict, Optional, Sequence, Tuple
+from pydantic import ValidationError
 from app.config import settings
-from app.utils.common import clean_json_response
+from app.schemas.document import DocumentInsights
+from app.utils.common import strip_json_fences
+from app.utils.rate_limit import AsyncRateLimiter
 
 logger = logging.getLogger("app.llm_service")
 import anthropic  # type: ignore
@@ -40,6 +47,16 @@ Rules:
 	•	Use clear, reader-friendly formatting for quick scanning.
 """
 
+# Map step for long documents: each chunk's notes are later combined into one
+# summary with system_prompt, so they keep facts rather than formatting
+chunk_system_prompt = """
+You are an efficient summarization assistant for insurance-related documents.
+You are given one section of a longer document. Write concise, factual notes on this section only:
+key facts, terms, conditions, amounts, dates, parties and required actions.
+Reproduce any tables as Markdown tables, preserving column and row names exactly as in the source.
+Do not add a title or TL;DR, and do not hallucinate or assume details from outside the section.
+"""
+
 insights_system_prompt = """
 You are an expert insurance document analyzer that extracts valuable insights from document summaries.
 Your task is to identify and extract key business-critical information based on the document type.
@@ -93,13 +110,108 @@ Rules:
 - Maintain accuracy over completeness
 - Return ONLY the JSON object, no markdown formatting
 """
+
+# Patterns for the heuristic insights fallback, compiled once. Each pattern is
+# scanned on its own, in this order, so matches (including overlapping ones such
+# as "$500" inside "premium $500") are reported as before.
+_AMOUNT_PATTERNS = (
+	re.compile(r'[\$₹€£¥]\s*[\d,]+(?:\.\d{2})?', re.IGNORECASE),
+	re.compile(r'(?:premium|amount|sum|cost|price)[\s:]*[\$₹€£¥]?\s*[\d,]+(?:\.\d{2})?', re.IGNORECASE),
+)
+_DATE_PATTERNS = (
+	re.compile(r'\d{1,2}[-/]\d{1,2}[-/]\d{4}'),
+	re.compile(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}'),
+)
+# Searched in place so the summary isn't lowercased into a full copy first
+_INSURANCE_TERM_RE = re.compile(r'premium|coverage|policy', re.IGNORECASE)
+
+# Documents longer than one prompt's worth of text are summarized map-reduce:
+# overlapping chunks are summarized in parallel, then the notes are combined
+_SUMMARY_MAX_CHARS = 20000
+_SUMMARY_CHUNK_CHARS = 8000
+_SUMMARY_CHUNK_OVERLAP = 500
+
+# Identify the prompts in response cache keys. Derived from the system prompts;
+# bump a suffix when the matching _build_*_prompt changes.
+INSIGHTS_PROMPT_VERSION = hashlib.blake2b((insights_system_prompt + "\x00v1").encode(), digest_size=8).hexdigest()
+SUMMARY_PROMPT_VERSION = hashlib.blake2b((system_prompt + "\x00v3").encode(), digest_size=8).hexdigest()
+
+
+# Extracted PDF text is padded with runs of spaces and blank lines; collapsing
+# them saves tokens and lets more real content fit under the truncation limit
+_INLINE_SPACE_RE = re.compile(r"[^\S\n]+")
+_LINE_EDGE_SPACE_RE = re.compile(r" ?\n ?")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def _compact_whitespace(text: str) -> str:
+	text = _INLINE_SPACE_RE.sub(" ", text)
+	text = _LINE_EDGE_SPACE_RE.sub("\n", text)
+	return _BLANK_LINES_RE.sub("\n\n", text)
+
+
+def _document_excerpt(text: str, max_chars: int) -> str:
+	"""Whitespace-compacted `text` cut to max_chars (marked when truncated).
+
+	Huge extractions are compacted from a bounded prefix, so a multi-megabyte
+	document isn't scanned in full just to keep its first max_chars.
+	"""
+	window = max_chars * 4
+	if len(text) > window:
+		compacted = _compact_whitespace(text[:window])
+		# The cut can only change the last collapsed whitespace run (<= 2 chars)
+		if len(compacted) > max_chars + 2:
+			return compacted[:max_chars] + "\n[TRUNCATED]"
+	return _truncate(_compact_whitespace(text), max_chars)
+
+
+def summary_input(text: str) -> str:
+	"""The whitespace-compacted part of `text` that summaries are generated from.
+
+	Text that only differs in spacing, or past what the model is ever shown,
+	yields the same input, so it also serves as the summary cache key material.
+	"""
+	step = _SUMMARY_CHUNK_CHARS - _SUMMARY_CHUNK_OVERLAP
+	return _document_excerpt(text, step * settings.LLM_SUMMARY_MAX_CHUNKS + _SUMMARY_CHUNK_OVERLAP)
+
+
+def batch_summary_input(text: str) -> str:
+	"""The part of `text` a batch summary is generated from.
+
+	Batch requests are a single prompt (no map-reduce), so long documents are
+	cut to one prompt's worth; short ones match summary_input exactly.
+	"""
+	return _document_excerpt(text, _SUMMARY_MAX_CHARS)
+
+
+def _truncate(text: str, max_chars: int) -> str:
+	if len(text) <= max_chars:
+		return text
+	return text[:max_chars] + "\n[TRUNCATED]"
+
+
+def _response_text(resp) -> str:
+	"""Join the text blocks of a Messages API response."""
+	# The SDK returns typed content blocks; only TextBlocks carry text
+	return "\n".join(block.text for block in resp.content if block.type == "text" and block.text).strip()
+
+
+# One HTTP/2 connection pool per process for Claude calls: concurrent requests
+# are multiplexed over a few kept-alive connections instead of each paying for
+# a TLS handshake. Keeps the SDK's default timeout. Closed on app shutdown.
+anthropic_http = anthropic.DefaultAsyncHttpxClient(
+	http2=True,
+	limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+)
+
+
 class LLMService:
 	"""Service wrapper for LLM interactions (currently: summarization via Claude)."""
 
 	def __init__(self, api_key: Optional[str] = None, model: str = "claude-sonnet-4-20250514"):
 		self.api_key = api_key or settings.ANTHROPIC_API_KEY
 		self.model = model
-		logger.info("Initializing LLMService (model=%s, api_key_set=%s)", self.model, os.environ.get("ANTHROPIC_API_KEY"))
+		logger.info("Initializing LLMService (model=%s, api_key_set=%s)", self.model, bool(self.api_key))
   
 		if self.api_key and not anthropic:
 			logger.warning(
@@ -108,9 +220,22 @@ class LLMService:
 		if not self.api_key:
 			logger.info("No ANTHROPIC_API_KEY set. Using fallback summarizer.")
 		logger.debug("Anthropic SDK available=%s", bool(anthropic))
-		self._client = anthropic.Anthropic(api_key=self.api_key) if (self.api_key and anthropic) else None
-
-	def summarize(self, text: str, filename: Optional[str] = None, max_output_tokens: int = 1024) -> str:
+		# Async client so Claude round trips don't block the event loop
+		self._client = anthropic.AsyncAnthropic(
+			api_key=self.api_key,
+			max_retries=settings.ANTHROPIC_MAX_RETRIES,
+			http_client=anthropic_http
+		) if (self.api_key and anthropic) else None
+		# Bursts of uploads queue here instead of failing over to the fallbacks on 429s
+		self._semaphore = asyncio.Semaphore(settings.ANTHROPIC_MAX_CONCURRENCY)
+		self._rate_limiter = AsyncRateLimiter(settings.ANTHROPIC_RPM, 60)
+
+	@property
+	def available(self) -> bool:
+		"""Whether responses come from Claude rather than the heuristic fallbacks."""
+		return self._client is not None
+
+	async def summarize(self, text: str, filename: Optional[str] = None, max_output_tokens: int = 1024) -> str:
 		"""Generate a summary for the provided text.
 
 		Args:
@@ -123,47 +248,111 @@ class LLMService:
 		"""
 		cleaned = (text or "").strip()
 
-		logger.info("Summarizing text with length=%d", len(cleaned))
+		logger.debug("Summarizing text with length=%d", len(cleaned))
 
 		if not cleaned:
 			return ""  # Nothing to summarize
 
-		if not self._client:
-			logger.info("No LLM client available; using fallback summarizer")
-			return self._fallback_summary(cleaned, filename)
+		summary_text = await self.request_summary(cleaned, filename, max_output_tokens)
+		if summary_text is None:
+			return self.fallback_summary(cleaned, filename)
+		return summary_text
 
+	async def request_summary(self, text: str, filename: Optional[str] = None, max_output_tokens: int = 1024) -> Optional[str]:
+		"""Ask Claude to summarize (non-empty, stripped) text.
 
-		user_prompt = self._build_user_prompt(cleaned, filename)
+		Returns None when no LLM client is configured or the call fails, so
+		callers can tell model output apart from the heuristic fallback.
+		"""
+		if not self._client:
+			logger.debug("No LLM client available; using fallback summarizer")
+			return None
 
 		try:
-			logger.info("Calling Claude model=%s for summarization (chars=%d)", self.model, len(cleaned))
-			resp = self._client.messages.create(
-				model=self.model,
-				max_tokens=max_output_tokens,
-				temperature=0.3,
-				system=system_prompt,
-				messages=[{"role": "user", "content": user_prompt}],
-			)
-			# anthropic SDK v1: resp.content is a list of content blocks
-			if hasattr(resp, "content") and resp.content:
-				# Join all text segments
-				parts = []
-				logger.info("Calling Claude model=%s for summarization (chars=%d), found content blocks", self.model, len(cleaned))
-
-				for block in resp.content:
-					# Block may be dict-like or object; handle both
-					text_part = getattr(block, "text", None) or (block.get("text") if isinstance(block, dict) else None)
-					if text_part:
-						parts.append(text_part)
-				summary_text = "\n".join(parts).strip()
-			else:
-				summary_text = ""  # Unexpected shape
-			return summary_text
+			if len(text) > _SUMMARY_MAX_CHARS:
+				# Compacting can bring a padded extraction back under the limit
+				excerpt = summary_input(text)
+				if len(excerpt) > _SUMMARY_MAX_CHARS:
+					return await self._summarize_chunked(excerpt, filename, max_output_tokens)
+
+			logger.info("Calling Claude model=%s for summarization (chars=%d)", self.model, len(text))
+			resp = await self._create_message(**self._summary_params(text, filename, max_output_tokens))
+			return _response_text(resp)
 		except Exception as e:  # pragma: no cover - network path
 			logger.exception("Claude summarization failed, falling back: %s", e)
-			return self._fallback_summary(cleaned, filename)
+			return None
+
+	async def summarize_batch(
+		self,
+		documents: Sequence[Tuple[str, str, Optional[str]]],
+		max_output_tokens: int = 1024
+	) -> Dict[str, str]:
+		"""Summarize many documents through the Message Batches API.
 
-	def extract_insights(self, summary_text: str, filename: Optional[str] = None, max_output_tokens: int = 2048) -> str:
+		Batched requests are billed at half price and don't count against the
+		per-minute rate limits, but results can take minutes to hours, so this
+		is only for non-interactive work such as backfills.
+
+		Args:
+			documents: (custom_id, text, filename) tuples; custom_id must be
+				unique and match [a-zA-Z0-9_-]{1,64}.
+			max_output_tokens: Upper bound for each summary's length.
+
+		Returns:
+			Summaries by custom_id. Documents with no text, or whose request
+			errored or expired, are left out.
+		"""
+		cleaned_documents = [
+			(custom_id, (text or "").strip(), filename) for custom_id, text, filename in documents
+		]
+		cleaned_documents = [document for document in cleaned_documents if document[1]]
+		if not cleaned_documents:
+			return {}
+
+		if not self._client:
+			logger.info("No LLM client available; using fallback summarizer for %d documents", len(cleaned_documents))
+			return {
+				custom_id: self.fallback_summary(cleaned, filename)
+				for custom_id, cleaned, filename in cleaned_documents
+			}
+
+		# The SDK version in use predates its batches resource, so the endpoints
+		# are called through the client's generic request methods (same auth,
+		# retries and base URL)
+		batch = await self._client.post(
+			"/v1/messages/batches",
+			cast_to=object,
+			body={"requests": [
+				{"custom_id": custom_id, "params": self._summary_params(cleaned, filename, max_output_tokens)}
+				for custom_id, cleaned, filename in cleaned_documents
+			]},
+		)
+		batch_id = batch["id"]
+		logger.info("Submitted summary batch %s (%d documents)", batch_id, len(cleaned_documents))
+
+		while batch.get("processing_status") != "ended":
+			await asyncio.sleep(settings.LLM_BATCH_POLL_SEC)
+			batch = await self._client.get(f"/v1/messages/batches/{batch_id}", cast_to=object)
+
+		logger.info("Summary batch %s ended (counts=%s)", batch_id, batch.get("request_counts"))
+		results = await self._client.get(f"/v1/messages/batches/{batch_id}/results", cast_to=str)
+
+		summaries = {}
+		for line in results.splitlines():
+			if not line.strip():
+				continue
+			entry = json.loads(line)
+			result = entry.get("result") or {}
+			if result.get("type") != "succeeded":
+				logger.warning("Batch summary for custom_id=%s did not succeed: %s", entry.get("custom_id"), result.get("type"))
+				continue
+			blocks = (result.get("message") or {}).get("content") or []
+			summaries[entry["custom_id"]] = "\n".join(
+				block["text"] for block in blocks if block.get("text")
+			).strip()
+		return summaries
+
+	async def extract_insights(self, summary_text: str, filename: Optional[str] = None, max_output_tokens: int = 2048) -> str:
 		"""Extract key insights from a document summary.
 
 		Args:
@@ -176,67 +365,130 @@ class LLMService:
 		"""
 		cleaned_summary = (summary_text or "").strip()
 
-		logger.info("Extracting insights from summary with length=%d", len(cleaned_summary))
+		logger.debug("Extracting insights from summary with length=%d", len(cleaned_summary))
 
 		if not cleaned_summary:
 			return "{}"  # Empty insights for empty summary
 
-		if not self._client:
-			logger.info("No LLM client available; using fallback insights extractor")
-			return self._fallback_insights(cleaned_summary, filename)
+		insights_text = await self.request_insights(cleaned_summary, filename, max_output_tokens)
+		if insights_text is None:
+			return self.fallback_insights(cleaned_summary, filename)
+		return insights_text
 
-		user_prompt = self._build_insights_prompt(cleaned_summary, filename)
+	async def request_insights(self, summary_text: str, filename: Optional[str] = None, max_output_tokens: int = 2048) -> Optional[str]:
+		"""Ask Claude for insights on a (non-empty, stripped) summary.
+
+		Returns None when no LLM client is configured or the call fails, so
+		callers can tell model output apart from the heuristic fallback.
+		"""
+		if not self._client:
+			logger.debug("No LLM client available; using fallback insights extractor")
+			return None
 
 		try:
 			logger.info("Calling Claude model=%s for insights extraction", self.model)
-			resp = self._client.messages.create(
-				model=self.model,
-				max_tokens=max_output_tokens,
-				temperature=0.1,  # Lower temperature for more consistent structured output
-				system=insights_system_prompt,
-				messages=[{"role": "user", "content": user_prompt}],
-			)
-			
-			if hasattr(resp, "content") and resp.content:
-				parts = []
-				logger.info("Calling Claude model=%s for insights extraction, found content blocks", self.model)
-
-				for block in resp.content:
-					text_part = getattr(block, "text", None) or (block.get("text") if isinstance(block, dict) else None)
-					if text_part:
-						parts.append(text_part)
-				insights_text = "\n".join(parts).strip()
-				
-				# Clean up any markdown formatting that might be present
-				insights_text = clean_json_response(insights_text)
-			else:
-				insights_text = "{}"  # Fallback to empty JSON
-				
-			return insights_text
+			resp = await self._create_message(**self._insights_params(summary_text, filename, max_output_tokens))
+			insights_text = _response_text(resp)
+			if not insights_text:
+				return "{}"
+			# Strip any markdown fence, then parse and check the shape in one pass
+			# so malformed output is never cached or stored
+			insights = DocumentInsights.model_validate_json(strip_json_fences(insights_text))
+			return insights.model_dump_json()
+		except ValidationError as e:
+			logger.warning("Claude returned unusable insights JSON, falling back: %s", e)
+			return None
 		except Exception as e:  # pragma: no cover - network path
 			logger.exception("Claude insights extraction failed, falling back: %s", e)
-			return self._fallback_insights(cleaned_summary, filename)
+			return None
 
 	# ------------------------- Internal Helpers ------------------------- #
+	async def _create_message(self, **params):
+		"""messages.create under the per-process concurrency cap and request rate."""
+		async with self._semaphore:
+			await self._rate_limiter.acquire()
+			return await self._client.messages.create(**params)
+
+	async def _summarize_chunked(self, text: str, filename: Optional[str], max_output_tokens: int) -> str:
+		"""Summarize overlapping chunks of `text` concurrently, then combine the notes."""
+		step = _SUMMARY_CHUNK_CHARS - _SUMMARY_CHUNK_OVERLAP
+		chunks = [text[i:i + _SUMMARY_CHUNK_CHARS] for i in range(0, len(text) - _SUMMARY_CHUNK_OVERLAP, step)]
+		logger.info(
+			"Calling Claude model=%s for chunked summarization (chars=%d, chunks=%d)",
+			self.model, len(text), len(chunks)
+		)
+		partials = await asyncio.gather(*(
+			self._create_message(
+				model=self.model,
+				max_tokens=max_output_tokens,
+				temperature=0.3,
+				system=chunk_system_prompt,
+				messages=[{"role": "user", "content": self._build_chunk_prompt(chunk, filename, index, len(chunks))}],
+			)
+			for index, chunk in enumerate(chunks, start=1)
+		))
+		resp = await self._create_message(
+			model=self.model,
+			max_tokens=max_output_tokens,
+			temperature=0.3,
+			system=system_prompt,
+			messages=[{"role": "user", "content": self._build_combine_prompt(
+				[_response_text(partial) for partial in partials], filename
+			)}],
+		)
+		return _response_text(resp)
+
+	def _summary_params(self, text: str, filename: Optional[str], max_output_tokens: int) -> dict:
+		"""Messages API parameters for summarizing `text`, shared by the realtime and batch paths."""
+		return {
+			"model": self.model,
+			"max_tokens": max_output_tokens,
+			"temperature": 0.3,
+			"system": system_prompt,
+			"messages": [{"role": "user", "content": self._build_user_prompt(text, filename)}],
+		}
+
+	def _insights_params(self, summary_text: str, filename: Optional[str], max_output_tokens: int) -> dict:
+		"""Messages API parameters for extracting insights from a summary."""
+		return {
+			"model": self.model,
+			"max_tokens": max_output_tokens,
+			"temperature": 0.1,  # Lower temperature for more consistent structured output
+			"system": insights_system_prompt,
+			"messages": [{"role": "user", "content": self._build_insights_prompt(summary_text, filename)}],
+		}
+
 	def _build_user_prompt(self, text: str, filename: Optional[str]) -> str:
-		prefix = f"Filename: {filename}\n" if filename else ""
 		# Truncate extremely long texts (simple safeguard)
-		max_chars = 20000
-		truncated = text[:max_chars]
-		if len(text) > max_chars:
-			truncated += "\n[TRUNCATED]"
-		return (
-			f"{prefix}Please summarize the following document.\n\n" \
-			f"--- DOCUMENT START ---\n{truncated}\n--- DOCUMENT END ---"
+		return "".join((
+			f"Filename: {filename}\n" if filename else "",
+			"Please summarize the following document.\n\n--- DOCUMENT START ---\n",
+			_document_excerpt(text, _SUMMARY_MAX_CHARS),
+			"\n--- DOCUMENT END ---",
+		))
+
+	def _build_chunk_prompt(self, chunk: str, filename: Optional[str], index: int, count: int) -> str:
+		return "".join((
+			f"Filename: {filename}\n" if filename else "",
+			f"Please write notes on section {index} of {count} of the following document.\n\n",
+			f"--- SECTION START ---\n{chunk}\n--- SECTION END ---",
+		))
+
+	def _build_combine_prompt(self, partials: Sequence[str], filename: Optional[str]) -> str:
+		sections = "\n\n".join(
+			f"--- SECTION {index} NOTES ---\n{partial}" for index, partial in enumerate(partials, start=1)
 		)
+		return "".join((
+			f"Filename: {filename}\n" if filename else "",
+			"The following are notes on consecutive sections of one document. ",
+			"Combine them into a single summary of the whole document.\n\n",
+			sections,
+		))
 
 	def _build_insights_prompt(self, summary_text: str, filename: Optional[str]) -> str:
 		prefix = f"Filename: {filename}\n" if filename else ""
 		# Truncate summary if too long
-		max_chars = 10000
-		truncated = summary_text[:max_chars]
-		if len(summary_text) > max_chars:
-			truncated += "\n[TRUNCATED]"
+		truncated = _truncate(summary_text, 10000)
 		return (
 			f"{prefix}Please extract key insights from the following document summary.\n\n" \
 			f"--- SUMMARY START ---\n{truncated}\n--- SUMMARY END ---\n\n" \
@@ -244,7 +496,7 @@ class LLMService:
 			f"important dates, and other business-critical data. Return the response in the specified JSON format."
 		)
 
-	def _fallback_summary(self, text: str, filename: Optional[str]) -> str:
+	def fallback_summary(self, text: str, filename: Optional[str]) -> str:
 		"""Heuristic fallback summarizer (no external calls)."""
 		# Simple fallback: truncate and add basic info
 		max_chars = 500
@@ -255,10 +507,8 @@ class LLMService:
 		title = filename or "Document"
 		return f"# {title}\n\n**TL;DR**: Document content preview (AI summarization unavailable)\n\n## Content Preview\n{truncated}"
 	
-	def _fallback_insights(self, summary_text: str, filename: Optional[str]) -> str:
+	def fallback_insights(self, summary_text: str, filename: Optional[str]) -> str:
 		"""Fallback insights extractor using simple heuristics."""
-		import re
-		import json
 		
 		# Basic pattern matching for common insurance terms
 		insights = {
@@ -282,49 +532,36 @@ class LLMService:
 			elif any(term in filename_lower for term in ["claim", "settlement"]):
 				insights["document_type"] = "insurance_claim"
 		
-		# Look for monetary amounts
-		money_patterns = [
-			r'[\$₹€£¥]\s*[\d,]+(?:\.\d{2})?',
-			r'(?:premium|amount|sum|cost|price)[\s:]*[\$₹€£¥]?\s*[\d,]+(?:\.\d{2})?'
+		# Look for monetary amounts and dates
+		financial_data = insights["key_insights"]["financial_data"]
+		financial_data["amounts"] = [
+			{"label": "Amount found", "value": value, "currency": "unknown"}
+			for pattern in _AMOUNT_PATTERNS
+			for value in pattern.findall(summary_text)
 		]
-		
-		for pattern in money_patterns:
-			matches = re.findall(pattern, summary_text, re.IGNORECASE)
-			for match in matches:
-				insights["key_insights"]["financial_data"]["amounts"].append({
-					"label": "Amount found",
-					"value": match,
-					"currency": "unknown"
-				})
-		
-		# Look for dates
-		date_patterns = [
-			r'\d{1,2}[-/]\d{1,2}[-/]\d{4}',
-			r'\d{4}[-/]\d{1,2}[-/]\d{1,2}'
+		financial_data["dates"] = [
+			{"label": "Date found", "date": value}
+			for pattern in _DATE_PATTERNS
+			for value in pattern.findall(summary_text)
 		]
 		
-		for pattern in date_patterns:
-			matches = re.findall(pattern, summary_text)
-			for match in matches:
-				insights["key_insights"]["financial_data"]["dates"].append({
-					"label": "Date found",
-					"date": match
-				})
-		
 		# Add some basic critical information
-		if any(term in summary_text.lower() for term in ["premium", "coverage", "policy"]):
+		if _INSURANCE_TERM_RE.search(summary_text):
 			insights["key_insights"]["critical_information"].append("Insurance-related document detected")
 		
 		return json.dumps(insights, indent=None)  # Return compact JSON without indentation
 
 
-# Lazy singleton pattern so logs occur after logging config & only when first used
+# Lazy singleton pattern so logs occur after logging config & only when first used.
+# Sync FastAPI dependencies run on the threadpool, so creation is locked to
+# avoid building two clients on a cold start.
 _llm_service_instance: Optional[LLMService] = None
+_llm_service_lock = threading.Lock()
 
 def get_llm_service() -> LLMService:
 	global _llm_service_instance
 	if _llm_service_instance is None:
-		_llm_service_instance = LLMService()
+		with _llm_service_lock:
+			if _llm_service_instance is None:
+				_llm_service_instance = LLMService()
 	return _llm_service_instance
-
-
@@ -1,46 +1,76 @@
 """Summarize Service for document summarization and storage."""
 
+import asyncio
 import logging
-from datetime import datetime
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
 from fastapi import HTTPException
-from google.cloud.exceptions import GoogleCloudError
+from google.cloud import firestore
+from google.cloud.exceptions import GoogleCloudError, NotFound
 
+from app.config import settings
 from app.database import get_firestore_client
-from app.schemas.document import DocumentSummaryCreate, DocumentSummaryResponse
-from app.models.document import DocumentSummary
-from app.services.llm_service import get_llm_service
+from app.schemas.document import DocumentSummaryResponse
+from app.services.llm_service import SUMMARY_PROMPT_VERSION, batch_summary_input, get_llm_service, summary_input
+from app.utils.llm_cache import LLMResponseCache
 
 logger = logging.getLogger("app.summarize_service")
 
+# Stored summaries kept in memory per process, keyed by document id
+_SUMMARY_CACHE_SIZE = 2048
+
 
 class SummarizeService:
     """Service for handling document summarization and summary storage."""
     
     def __init__(self):
-        self.firestore_client = get_firestore_client()
         self.llm_service = get_llm_service()
+        # Identical document text (e.g. re-uploads of the same file) reuses the model's earlier summary
+        self._response_cache = LLMResponseCache("summary")
+        # Repeat reads of the same document skip Firestore for a few minutes;
+        # entries are (expires_at, summary) and dropped on store/update/delete
+        self._summary_cache: "OrderedDict[str, Tuple[float, DocumentSummaryResponse]]" = OrderedDict()
+
+    @property
+    def firestore_client(self):
+        # Resolved on each access so one shared instance still spreads RPCs over the client pool
+        return get_firestore_client()
+
+    def build_summary_record(self, document_id: str, summary_text: str) -> Dict[str, Any]:
+        """Build the Firestore payload for a stored summary without writing it.
+
+        Lets callers add the summary to a WriteBatch alongside related writes.
+        Timestamps are assigned by Firestore at commit time.
+        """
+        return {
+            "document_id": document_id,
+            "summary_text": summary_text,
+            "created_at": firestore.SERVER_TIMESTAMP,
+            "updated_at": firestore.SERVER_TIMESTAMP
+        }
 
     async def store_document_summary(self, document_id: str, summary_text: str) -> DocumentSummaryResponse:
         """Store a document summary in Firebase."""
         try:
             logger.info("Storing summary for document_id=%s", document_id)
             
-            summary_data = {
-                "document_id": document_id,
-                "summary_text": summary_text,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
+            summary_data = self.build_summary_record(document_id, summary_text)
             
             # Store in the document_summaries collection
-            import asyncio
-            loop = asyncio.get_running_loop()
             summary_ref = self.firestore_client.collection("document_summaries").document(document_id)
-            await loop.run_in_executor(None, summary_ref.set, summary_data)
+            write_result = await summary_ref.set(summary_data)
+            self._summary_cache.pop(document_id, None)
             
             logger.info("Successfully stored summary for document_id=%s", document_id)
-            return DocumentSummaryResponse(**summary_data)
+            # Both timestamps resolve to the commit time carried by the write result.
+            # Every field was just produced here, so validation is skipped.
+            return DocumentSummaryResponse.model_construct(
+                document_id=document_id,
+                summary_text=summary_text,
+                created_at=write_result.update_time,
+                updated_at=write_result.update_time
+            )
             
         except GoogleCloudError as e:
             logger.exception("Google Cloud error storing document summary")
@@ -52,12 +82,14 @@ class SummarizeService:
     async def get_stored_document_summary(self, document_id: str) -> Optional[DocumentSummaryResponse]:
         """Retrieve a stored document summary from Firebase."""
         try:
+            cached = self.cached_stored_summary(document_id)
+            if cached is not None:
+                return cached
+
             logger.info("Retrieving stored summary for document_id=%s", document_id)
             
-            import asyncio
-            loop = asyncio.get_running_loop()
             summary_ref = self.firestore_client.collection("document_summaries").document(document_id)
-            summary_doc = await loop.run_in_executor(None, summary_ref.get)
+            summary_doc = await summary_ref.get()
             
             if not summary_doc.exists:
                 logger.info("No stored summary found for document_id=%s", document_id)
@@ -65,7 +97,9 @@ class SummarizeService:
             
             summary_data = summary_doc.to_dict()
             logger.info("Found stored summary for document_id=%s", document_id)
-            return DocumentSummaryResponse(**summary_data)
+            stored_summary = DocumentSummaryResponse.model_validate(summary_data)
+            self.remember_stored_summary(document_id, stored_summary)
+            return stored_summary
             
         except GoogleCloudError as e:
             logger.exception("Google Cloud error retrieving document summary")
@@ -83,7 +117,20 @@ class SummarizeService:
                 logger.warning("No text content provided for summarization")
                 return ""
             
-            summary_text = self.llm_service.summarize(text_content, filename)
+            cleaned = text_content.strip()
+            cache_key = self._response_cache_key(cleaned, filename)
+            summary_text = await self._response_cache.get(cache_key)
+            if summary_text is not None:
+                logger.info("Reusing cached summary for identical content (key=%s)", cache_key)
+                return summary_text
+
+            summary_text = await self.llm_service.request_summary(cleaned, filename)
+            if summary_text is None:
+                # Heuristic output isn't cached so the model is retried next time
+                return self.llm_service.fallback_summary(cleaned, filename)
+
+            if summary_text:
+                await self._response_cache.set(cache_key, summary_text)
             logger.info("Successfully generated summary for document")
             return summary_text
             
@@ -92,32 +139,72 @@ class SummarizeService:
             # Don't raise HTTPException here, let the caller decide how to handle it
             return f"Error generating summary: {str(e)}"
 
-    async def get_or_generate_summary(self, document_id: str, text_content: str, filename: str) -> str:
-        """Get existing summary or generate new one if not exists."""
-        try:
-            # First try to get stored summary
-            stored_summary = await self.get_stored_document_summary(document_id)
-            if stored_summary:
-                logger.info("Using stored summary for document_id=%s", document_id)
-                return stored_summary.summary_text
-            
-            # Generate new summary
-            logger.info("No stored summary found, generating new one for document_id=%s", document_id)
-            summary_text = await self.generate_document_summary(text_content, filename)
-            
-            if summary_text:
-                # Store the generated summary for future use
-                try:
-                    await self.store_document_summary(document_id, summary_text)
-                    logger.info("Successfully stored generated summary for future use")
-                except Exception as e:
-                    logger.warning("Failed to store generated summary: %s", e)
-            
-            return summary_text
-            
-        except Exception as e:
-            logger.exception("Error in get_or_generate_summary")
-            return f"Error processing summary: {str(e)}"
+    async def generate_document_summaries(self, documents: Sequence[Tuple[str, str, str]]) -> Dict[str, str]:
+        """Summarize several (document_id, text_content, filename) entries in one
+        LLM batch; slow but half price, see LLMService.summarize_batch."""
+        entries = [
+            (document_id, text_content.strip(), filename)
+            for document_id, text_content, filename in documents
+            if text_content and text_content.strip()
+        ]
+        cache_keys = {
+            document_id: self._response_cache_key(cleaned, filename, batch=True)
+            for document_id, cleaned, filename in entries
+        }
+        cached = await asyncio.gather(*(self._response_cache.get(cache_keys[document_id]) for document_id, _, _ in entries))
+
+        summaries: Dict[str, str] = {}
+        pending = []
+        for entry, cached_summary in zip(entries, cached):
+            if cached_summary is not None:
+                summaries[entry[0]] = cached_summary
+            else:
+                pending.append(entry)
+
+        logger.info("Generating summaries for %d documents in one batch (%d cached)", len(pending), len(summaries))
+        if pending:
+            generated = await self.llm_service.summarize_batch(pending)
+            # Heuristic output isn't cached so the model is retried next time
+            if self.llm_service.available:
+                await asyncio.gather(*(
+                    self._response_cache.set(cache_keys[document_id], summary_text)
+                    for document_id, summary_text in generated.items() if summary_text
+                ))
+            summaries.update(generated)
+        return summaries
+
+    def _response_cache_key(self, text: str, filename: Optional[str], batch: bool = False) -> str:
+        # Keyed on what the model is shown, so re-extractions that only differ in
+        # whitespace (or past the input limit) reuse the earlier summary. Batch
+        # summaries of long documents see a shorter excerpt, so they get their own
+        # keys and the map-reduce path never returns a truncated summary.
+        model_input = batch_summary_input(text) if batch else summary_input(text)
+        return LLMResponseCache.key(model_input, filename, self.llm_service.model, SUMMARY_PROMPT_VERSION)
+
+    def forget_stored_summary(self, document_id: str) -> None:
+        """Drop a cached summary after it was written outside this service."""
+        self._summary_cache.pop(document_id, None)
+
+    def cached_stored_summary(self, document_id: str) -> Optional[DocumentSummaryResponse]:
+        """Return the stored summary held in memory for a document, if still fresh."""
+        entry = self._summary_cache.get(document_id)
+        if entry is None:
+            return None
+        expires_at, summary = entry
+        if expires_at <= time.monotonic():
+            del self._summary_cache[document_id]
+            return None
+        self._summary_cache.move_to_end(document_id)
+        return summary
+
+    def remember_stored_summary(self, document_id: str, summary: DocumentSummaryResponse) -> None:
+        """Cache a stored summary that was read outside this service."""
+        if settings.SUMMARY_CACHE_TTL_SEC <= 0:
+            return
+        self._summary_cache[document_id] = (time.monotonic() + settings.SUMMARY_CACHE_TTL_SEC, summary)
+        self._summary_cache.move_to_end(document_id)
+        while len(self._summary_cache) > _SUMMARY_CACHE_SIZE:
+            self._summary_cache.popitem(last=False)
 
     async def update_document_summary(self, document_id: str, new_summary_text: str) -> DocumentSummaryResponse:
         """Update an existing document summary."""
@@ -127,29 +214,39 @@ class SummarizeService:
             summary_data = {
                 "document_id": document_id,
                 "summary_text": new_summary_text,
-                "updated_at": datetime.utcnow()
+                "updated_at": firestore.SERVER_TIMESTAMP
             }
             
-            # Check if summary exists first
-            existing_summary = await self.get_stored_document_summary(document_id)
-            if existing_summary:
-                # Update existing
-                summary_data["created_at"] = existing_summary.created_at
-                import asyncio
-                loop = asyncio.get_running_loop()
-                summary_ref = self.firestore_client.collection("document_summaries").document(document_id)
-                await loop.run_in_executor(None, summary_ref.update, summary_data)
-                logger.info("Successfully updated existing summary for document_id=%s", document_id)
-            else:
+            # Write and read created_at concurrently instead of checking for the
+            # summary first: one round trip of latency when it already exists
+            summary_ref = self.firestore_client.collection("document_summaries").document(document_id)
+            update_result, snapshot = await asyncio.gather(
+                summary_ref.update(summary_data),
+                summary_ref.get(field_paths=["created_at"]),
+                return_exceptions=True
+            )
+            if isinstance(update_result, NotFound):
                 # Create new if doesn't exist
-                summary_data["created_at"] = datetime.utcnow()
-                import asyncio
-                loop = asyncio.get_running_loop()
-                summary_ref = self.firestore_client.collection("document_summaries").document(document_id)
-                await loop.run_in_executor(None, summary_ref.set, summary_data)
+                summary_data["created_at"] = firestore.SERVER_TIMESTAMP
+                write_result = await summary_ref.set(summary_data)
+                created_at = write_result.update_time
                 logger.info("Successfully created new summary for document_id=%s", document_id)
+            else:
+                for result in (update_result, snapshot):
+                    if isinstance(result, BaseException):
+                        raise result
+                write_result = update_result
+                # Older rows may lack created_at; fall back to this write's time
+                created_at = (snapshot.to_dict() or {}).get("created_at") or write_result.update_time
+                logger.info("Successfully updated existing summary for document_id=%s", document_id)
             
-            return DocumentSummaryResponse(**summary_data)
+            self._summary_cache.pop(document_id, None)
+            return DocumentSummaryResponse(
+                document_id=document_id,
+                summary_text=new_summary_text,
+                created_at=created_at,
+                updated_at=write_result.update_time
+            )
             
         except GoogleCloudError as e:
             logger.exception("Google Cloud error updating document summary")
@@ -163,10 +260,9 @@ class SummarizeService:
         try:
             logger.info("Deleting summary for document_id=%s", document_id)
             
-            import asyncio
-            loop = asyncio.get_running_loop()
             summary_ref = self.firestore_client.collection("document_summaries").document(document_id)
-            await loop.run_in_executor(None, summary_ref.delete)
+            await summary_ref.delete()
+            self._summary_cache.pop(document_id, None)
             
             logger.info("Successfully deleted summary for document_id=%s", document_id)
             return True
@@ -179,7 +275,12 @@ class SummarizeService:
             raise HTTPException(status_code=500, detail=f"Failed to delete document summary: {e}")
 
 
-# Convenience function to get summarize service instance
+# Lazy singleton; the service holds no per-request state
+_summarize_service_instance: Optional[SummarizeService] = None
+
 def get_summarize_service() -> SummarizeService:
-    """Get an instance of the SummarizeService."""
-    return SummarizeService()
\ No newline at end of file
+    """Get the shared SummarizeService instance."""
+    global _summarize_service_instance
+    if _summarize_service_instance is None:
+        _summarize_service_instance = SummarizeService()
+    return _summarize_service_instance
\ No newline at end of file
@@ -1,32 +1,30 @@
 from datetime import datetime
-from typing import Optional
+from typing import TYPE_CHECKING, List, Optional, Tuple
 import logging
-import json
-from google.cloud import storage
-import io
+import orjson
+from collections import OrderedDict
 from app.config import settings
-import pdfplumber
+from app.utils.gcs import download_object_if_changed
+from app.utils.pools import CPU_POOL, PROCESS_POOL_SIZE, get_process_pool
+import asyncio
+from functools import lru_cache
 
     
+if TYPE_CHECKING:
+    from google.cloud import storage
+
 logger = logging.getLogger("app.utils.common")
 
 def normalize_datetime(dt):
-    if hasattr(dt, "replace"):  # works for both datetime and DatetimeWithNanoseconds
+    if isinstance(dt, datetime):  # includes Firestore's DatetimeWithNanoseconds
         return dt.replace(tzinfo=None)  # remove tzinfo if needed
     return dt
 
 
-def clean_json_response(response_text: str) -> str:
-    """Clean JSON response by removing markdown formatting and returning valid JSON.
-    
-    Args:
-        response_text: Raw response text that may contain markdown formatting
-        
-    Returns:
-        Cleaned JSON string, or empty JSON object "{}" if invalid
-    """
+def strip_json_fences(response_text: str) -> str:
+    """Remove a surrounding markdown code fence (```json ... ```) and whitespace."""
     if not response_text:
-        return "{}"
+        return ""
     
     cleaned = response_text.strip()
     
@@ -41,7 +39,22 @@ def clean_json_response(response_text: str) -> str:
             cleaned = cleaned[:-3]  # Remove trailing ```
     
     # Remove any extra whitespace or newlines at the start/end
-    cleaned = cleaned.strip()
+    return cleaned.strip()
+
+
+def clean_json_response(response_text: str) -> str:
+    """Clean JSON response by removing markdown formatting and returning valid JSON.
+    
+    Args:
+        response_text: Raw response text that may contain markdown formatting
+        
+    Returns:
+        Cleaned JSON string, or empty JSON object "{}" if invalid
+    """
+    cleaned = response_text.strip() if response_text else ""
+    # Bare JSON (the common case) has no fence to strip
+    if not cleaned.startswith(("{", "[")):
+        cleaned = strip_json_fences(cleaned)
     
     # If the response is empty after cleaning, return empty JSON
     if not cleaned:
@@ -49,29 +62,45 @@ def clean_json_response(response_text: str) -> str:
     
     # Validate that it's valid JSON
     try:
-        json.loads(cleaned)  # This will raise JSONDecodeError if invalid
+        orjson.loads(cleaned)  # This will raise JSONDecodeError if invalid
         return cleaned
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         logger.warning("Cleaned response is not valid JSON: %s", repr(cleaned[:100]))
         return "{}"
 
 
 from urllib.parse import urlparse, unquote
 
+_BUCKET_NAMES = frozenset({settings.FIREBASE_STORAGE_BUCKET})
+
+# Forms the app itself writes (gs:// paths, signed and Firebase download URLs)
+# are peeled with a prefix slice; anything else goes through urlparse
+_BLOB_PATH_PREFIXES = (
+    f"https://storage.googleapis.com/{settings.FIREBASE_STORAGE_BUCKET}/",
+    f"https://firebasestorage.googleapis.com/v0/b/{settings.FIREBASE_STORAGE_BUCKET}/o/",
+)
+
 def extract_blob_name(storage_path: str) -> Optional[str]:
     try:
+        # gs:// paths hold the raw object name: '%' and '?' are part of it, not URL syntax
+        if storage_path.startswith("gs://"):
+            _, _, blob_name = storage_path[len("gs://"):].partition("/")
+            return blob_name or None
+
+        for prefix in _BLOB_PATH_PREFIXES:
+            if storage_path.startswith(prefix):
+                return unquote(storage_path[len(prefix):].split('?', 1)[0])
+
         parsed = urlparse(storage_path)
         path_no_slash = parsed.path.lstrip('/')
         parts = path_no_slash.split('/', 1)
 
-        bucket_names = {settings.FIREBASE_STORAGE_BUCKET}
-
         # Case 1 & 2: bucket in path
-        if len(parts) == 2 and (parts[0] in bucket_names):
+        if len(parts) == 2 and (parts[0] in _BUCKET_NAMES):
             return unquote(parts[1].split('?')[0])
 
         # Case 3: bucket in domain, object in path
-        if parsed.netloc in bucket_names and path_no_slash:
+        if parsed.netloc in _BUCKET_NAMES and path_no_slash:
             return unquote(path_no_slash.split('?')[0])
 
         # Fallback: last path segment only
@@ -80,7 +109,7 @@ def extract_blob_name(storage_path: str) -> Optional[str]:
         logger.exception("Failed to parse blob name from storage path '%s'", storage_path)
         return None
 
-def download_blob_text_with_parsing(storage_client: storage.Client, blob_name: str) -> Optional[str]:
+def download_blob_text_with_parsing(storage_client: "storage.Client", blob_name: str) -> Optional[str]:
     if not blob_name:
         return None
 
@@ -98,26 +127,163 @@ def download_blob_text_with_parsing(storage_client: storage.Client, blob_name: s
         logger.info("Downloading blob '%s' with content_type='%s'", blob_name, content_type)
 
         file_bytes = blob.download_as_bytes()
+        return parse_blob_text(blob_name, content_type, file_bytes)
 
-        # For textual content types, decode directly
-        if "text" in content_type or content_type in ("application/json", "application/xml"):
-            try:
-                return file_bytes.decode("utf-8")
-            except UnicodeDecodeError:
-                return file_bytes.decode("latin-1", errors="replace")
-
-        # PDF parsing
-        elif content_type == "application/pdf" or blob_name.lower().endswith(".pdf"):
-            text_parts = []
-            with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-                for page in pdf.pages:
-                    text_parts.append(page.extract_text() or "")
-            return "\n".join(text_parts).strip() or None
+    except Exception as e:
+        logger.debug("Could not download or parse blob '%s': %s", blob_name, e)
+        return None
+
+
+# Parsed text by blob name as (generation, text), LRU-evicted by total length.
+# Downloads of a cached blob are conditional on its generation, so an unchanged
+# object costs a bodiless 304 instead of a download and re-parse.
+_parsed_text_cache: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+_parsed_text_cache_chars = 0
+
+
+def _remember_parsed_text(blob_name: str, generation: str, text: Optional[str]) -> None:
+    global _parsed_text_cache_chars
+    previous = _parsed_text_cache.pop(blob_name, None)
+    if previous is not None:
+        _parsed_text_cache_chars -= len(previous[1])
+    limit = settings.PARSED_TEXT_CACHE_MB * 1024 * 1024
+    if not text or not generation or len(text) > limit:
+        return
+    _parsed_text_cache[blob_name] = (generation, text)
+    _parsed_text_cache_chars += len(text)
+    while _parsed_text_cache_chars > limit:
+        _, (_, evicted) = _parsed_text_cache.popitem(last=False)
+        _parsed_text_cache_chars -= len(evicted)
+
+
+async def download_blob_text_async(blob_name: str) -> Optional[str]:
+    """Async variant of download_blob_text_with_parsing.
 
+    Reads the object over the shared HTTP/2 client (one request, content type
+    comes from the response headers) and parses it on the CPU or process pool.
+    Text of an unchanged object is served from memory.
+    """
+    if not blob_name:
+        return None
+
+    bucket_name = settings.FIREBASE_STORAGE_BUCKET or getattr(settings, "GCS_BUCKET", None)
+    if not bucket_name:
+        logger.info("No bucket name configured; skipping blob download")
+        return None
+
+    try:
+        cached = _parsed_text_cache.get(blob_name)
+        downloaded = await download_object_if_changed(bucket_name, blob_name, cached[0] if cached else None)
+        if downloaded is None:
+            logger.info("Reusing parsed text for unchanged blob '%s'", blob_name)
+            # The entry may have been evicted while the request was in flight
+            if blob_name in _parsed_text_cache:
+                _parsed_text_cache.move_to_end(blob_name)
+            return cached[1]
+
+        file_bytes, content_type, generation = downloaded
+        logger.info("Downloaded blob '%s' with content_type='%s'", blob_name, content_type)
+
+        if not _is_text_type(content_type) and _is_pdf(blob_name, content_type):
+            text = await _extract_pdf_text_async(file_bytes)
         else:
-            logger.info("Unsupported content type or extension for blob '%s'", blob_name)
-            return None
+            text = await asyncio.get_running_loop().run_in_executor(
+                CPU_POOL, parse_blob_text, blob_name, content_type, file_bytes
+            )
+        _remember_parsed_text(blob_name, generation, text)
+        return text
 
     except Exception as e:
         logger.debug("Could not download or parse blob '%s': %s", blob_name, e)
-        return None
\ No newline at end of file
+        return None
+
+
+# The PDF libraries take ~150ms to import, so they're loaded on the first parse
+# rather than by every process that imports this module. The pdfplumber helpers
+# live outside app.utils so process-pool workers can import them on their own.
+@lru_cache(maxsize=None)
+def _pdf_pages():
+    from app import pdf_pages
+    return pdf_pages
+
+
+# MuPDF (native) extracts text far faster than pdfminer; pdfplumber remains the
+# fallback when PyMuPDF isn't installed or can't read a particular file
+@lru_cache(maxsize=None)
+def _mupdf():
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return fitz
+
+
+def parse_blob_text(blob_name: str, content_type: str, file_bytes: bytes) -> Optional[str]:
+    # For textual content types, decode directly
+    if _is_text_type(content_type):
+        try:
+            return file_bytes.decode("utf-8")
+        except UnicodeDecodeError:
+            return file_bytes.decode("latin-1", errors="replace")
+
+    # PDF parsing
+    elif _is_pdf(blob_name, content_type):
+        if _mupdf() is not None:
+            try:
+                return "\n".join(extract_pdf_pages_mupdf(file_bytes)).strip() or None
+            except Exception as e:
+                logger.info("PyMuPDF could not read blob '%s', falling back to pdfplumber: %s", blob_name, e)
+        return "\n".join(_pdf_pages().extract_pdf_pages(file_bytes)).strip() or None
+
+    else:
+        logger.info("Unsupported content type or extension for blob '%s'", blob_name)
+        return None
+
+
+def _is_text_type(content_type: str) -> bool:
+    return "text" in content_type or content_type in ("application/json", "application/xml")
+
+
+def _is_pdf(blob_name: str, content_type: str) -> bool:
+    return content_type == "application/pdf" or blob_name.lower().endswith(".pdf")
+
+
+# Fewer pages than this per worker and the process round trip (pickling the
+# file, re-opening it) costs more than the parallelism saves
+_MIN_PDF_PAGES_PER_TASK = 8
+
+
+def extract_pdf_pages_mupdf(file_bytes: bytes) -> List[str]:
+    """Text of every page of a PDF, extracted by MuPDF."""
+    with _mupdf().open(stream=file_bytes, filetype="pdf") as doc:
+        return [page.get_text("text").rstrip() for page in doc]
+
+
+async def _extract_pdf_text_async(file_bytes: bytes) -> Optional[str]:
+    """Extract PDF text with MuPDF when available. Otherwise (or when MuPDF
+    fails) pdfplumber is used, with long documents split into page ranges
+    that are parsed in parallel on the process pool.
+    """
+    loop = asyncio.get_running_loop()
+    if _mupdf() is not None:
+        try:
+            text_parts = await loop.run_in_executor(CPU_POOL, extract_pdf_pages_mupdf, file_bytes)
+            return "\n".join(text_parts).strip() or None
+        except Exception as e:
+            logger.info("PyMuPDF could not read PDF, falling back to pdfplumber: %s", e)
+
+    pdf_pages = _pdf_pages()
+    page_count = await loop.run_in_executor(CPU_POOL, pdf_pages.pdf_page_count, file_bytes)
+    tasks = min(PROCESS_POOL_SIZE, page_count // _MIN_PDF_PAGES_PER_TASK)
+    if tasks <= 1:
+        text_parts = await loop.run_in_executor(CPU_POOL, pdf_pages.extract_pdf_pages, file_bytes)
+    else:
+        # Even split, so one file costs at most PROCESS_POOL_SIZE copies over IPC
+        bounds = [page_count * i // tasks for i in range(tasks + 1)]
+        pool = get_process_pool()
+        ranges = await asyncio.gather(*(
+            loop.run_in_executor(pool, pdf_pages.extract_pdf_pages, file_bytes, start, stop)
+            for start, stop in zip(bounds, bounds[1:])
+        ))
+        text_parts = [text for page_texts in ranges for text in page_texts]
+    return "\n".join(text_parts).strip() or None
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Dict, List, Sequence, Tuple
+
+from google.api_core import exceptions as api_exceptions
+from google.api_core import retry_async
+
+from app.database import get_firestore_client
+
+# Writes per WriteBatch for bulk paths; small batches commit faster than one
+# large one (Firestore allows up to 500)
+WRITE_BATCH_SIZE = 50
+
+# Commits of plain sets are idempotent, so contention and transient backend
+# errors are retried with exponential backoff instead of failing the whole bulk write
+_COMMIT_RETRY = retry_async.AsyncRetry(
+    predicate=retry_async.if_exception_type(
+        api_exceptions.Aborted,
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.InternalServerError,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.ServiceUnavailable,
+    ),
+    initial=0.5,
+    maximum=8.0,
+    multiplier=2.0,
+    timeout=60.0,
+)
+
+
+async def commit_sets(writes: Sequence[Tuple[Any, Dict[str, Any]]], batch_size: int = WRITE_BATCH_SIZE) -> List[Any]:
+    """Commit (reference, payload) sets in WriteBatches of `batch_size`, concurrently.
+
+    Returns the WriteResults in the order of `writes`.
+    """
+    client = get_firestore_client()
+    batches = []
+    for start in range(0, len(writes), batch_size):
+        batch = client.batch()
+        for ref, payload in writes[start:start + batch_size]:
+            batch.set(ref, payload)
+        batches.append(batch)
+    results = await asyncio.gather(*(batch.commit(retry=_COMMIT_RETRY) for batch in batches))
+    return [write_result for batch_results in results for write_result in batch_results]
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import random
+import secrets
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import httpx
+from google.api_core import exceptions as api_exceptions
+
+from app.database import get_storage_async_http, get_storage_auth_headers
+
+logger = logging.getLogger("app.utils.gcs")
+
+# Native async Cloud Storage calls over the shared HTTP/2 client (JSON API).
+# Errors are raised as google.api_core exceptions so callers can keep catching
+# GoogleCloudError the same way they do for the SDK.
+_API_BASE = "https://storage.googleapis.com/storage/v1"
+_UPLOAD_BASE = "https://storage.googleapis.com/upload/storage/v1"
+_BATCH_URL = "https://storage.googleapis.com/batch/storage/v1"
+
+# The batch endpoint accepts at most 100 calls per request
+_MAX_BATCH_CALLS = 100
+
+# Idempotent writes (object uploads, composes into a fresh destination, batch
+# deletes) are retried on transient failures, so one failed part doesn't abort a whole upload
+_RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+_MAX_ATTEMPTS = 4
+_INITIAL_BACKOFF_SEC = 0.5
+
+
+def _bucket_path(bucket: str) -> str:
+    return f"b/{quote(bucket, safe='')}"
+
+
+def _object_url(bucket: str, name: str) -> str:
+    return f"{_API_BASE}/{_bucket_path(bucket)}/o/{quote(name, safe='')}"
+
+
+def _raise_for_status(response: httpx.Response) -> None:
+    if response.is_error:
+        raise api_exceptions.from_http_status(
+            response.status_code,
+            f"{response.request.method} {response.request.url.path}: {response.text[:200]}",
+            response=response,
+        )
+
+
+async def _send_with_retries(send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+    """Run `send`, retrying transport errors and transient statuses with jittered
+    exponential backoff. The last response (or error) is returned as is."""
+    delay = _INITIAL_BACKOFF_SEC
+    for attempt in range(1, _MAX_ATTEMPTS + 1):
+        try:
+            response = await send()
+        except httpx.TransportError as e:
+            if attempt == _MAX_ATTEMPTS:
+                raise
+            logger.warning("Storage request failed (attempt %d/%d), retrying: %s", attempt, _MAX_ATTEMPTS, e)
+        else:
+            if response.status_code not in _RETRY_STATUSES or attempt == _MAX_ATTEMPTS:
+                return response
+            logger.warning(
+                "Storage request returned %d (attempt %d/%d), retrying",
+                response.status_code, attempt, _MAX_ATTEMPTS,
+            )
+        await asyncio.sleep(delay * (1 + random.random()))
+        delay *= 2
+
+
+async def upload_object(bucket: str, name: str, data: bytes, content_type: Optional[str] = None) -> None:
+    """Upload `data` as a single-request (uploadType=media) object write."""
+    headers = await get_storage_auth_headers()
+    headers["Content-Type"] = content_type or "application/octet-stream"
+    response = await _send_with_retries(lambda: get_storage_async_http().post(
+        f"{_UPLOAD_BASE}/{_bucket_path(bucket)}/o",
+        params={"uploadType": "media", "name": name},
+        content=data,
+        headers=headers,
+    ))
+    _raise_for_status(response)
+
+
+async def compose_objects(bucket: str, name: str, sources: Iterable[str], content_type: Optional[str] = None) -> None:
+    """Concatenate up to 32 source objects into `name`.
+
+    Retried on transient failures, so `name` must not be one of the sources.
+    """
+    body = {
+        "sourceObjects": [{"name": source} for source in sources],
+        "destination": {"contentType": content_type or "application/octet-stream"},
+    }
+    headers = await get_storage_auth_headers()
+    response = await _send_with_retries(lambda: get_storage_async_http().post(
+        f"{_object_url(bucket, name)}/compose",
+        json=body,
+        headers=headers,
+    ))
+    _raise_for_status(response)
+
+
+async def delete_object(bucket: str, name: str) -> None:
+    """Delete an object; a missing object is not an error."""
+    response = await get_storage_async_http().delete(
+        _object_url(bucket, name),
+        headers=await get_storage_auth_headers(),
+    )
+    if response.status_code == 404:
+        return
+    _raise_for_status(response)
+
+
+async def delete_objects(bucket: str, names: Sequence[str]) -> None:
+    """Delete several objects with one batch request per 100 names.
+
+    Individual deletes inside a batch may fail (e.g. already gone); only a
+    failure of the batch request itself is raised.
+    """
+    for start in range(0, len(names), _MAX_BATCH_CALLS):
+        chunk = names[start:start + _MAX_BATCH_CALLS]
+        boundary = f"batch_{secrets.token_hex(8)}"
+        parts = []
+        for i, name in enumerate(chunk):
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <{i}>\r\n\r\n"
+                f"DELETE /storage/v1/{_bucket_path(bucket)}/o/{quote(name, safe='')} HTTP/1.1\r\n\r\n"
+            )
+        body = "".join(parts) + f"--{boundary}--\r\n"
+
+        headers = await get_storage_auth_headers()
+        headers["Content-Type"] = f"multipart/mixed; boundary={boundary}"
+        content = body.encode()
+        response = await _send_with_retries(
+            lambda: get_storage_async_http().post(_BATCH_URL, content=content, headers=headers)
+        )
+        _raise_for_status(response)
+
+
+async def get_object_metadata(bucket: str, name: str) -> Dict[str, Any]:
+    """Return the object's JSON API resource (size, contentType, md5Hash, ...)."""
+    response = await get_storage_async_http().get(
+        _object_url(bucket, name),
+        headers=await get_storage_auth_headers(),
+    )
+    _raise_for_status(response)
+    return response.json()
+
+
+async def download_object(bucket: str, name: str) -> Tuple[bytes, str]:
+    """Return the object's bytes and its content type."""
+    file_bytes, content_type, _ = await download_object_if_changed(bucket, name)
+    return file_bytes, content_type
+
+
+async def download_object_if_changed(
+    bucket: str, name: str, generation: Optional[str] = None
+) -> Optional[Tuple[bytes, str, str]]:
+    """Return the object's bytes, content type and generation.
+
+    With `generation`, the download is conditional: None is returned (and no
+    body sent) while the live object is still that generation.
+    """
+    params = {"alt": "media"}
+    if generation is not None:
+        params["ifGenerationNotMatch"] = generation
+    response = await get_storage_async_http().get(
+        _object_url(bucket, name),
+        params=params,
+        headers=await get_storage_auth_headers(),
+    )
+    if response.status_code == 304:
+        return None
+    _raise_for_status(response)
+    content_type = response.headers.get("content-type", "").split(";")[0].strip()
+    return response.content, content_type, response.headers.get("x-goog-generation", "")
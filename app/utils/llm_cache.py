@@ -0,0 +1,62 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from google.cloud import firestore
+
+from app.database import get_firestore_client
+
+logger = logging.getLogger("app.utils.llm_cache")
+
+
+class LLMResponseCache:
+    """Exact-match cache of model responses, keyed by a hash of everything that
+    shaped them (input text, model, prompt version, ...).
+
+    Lookups check a per-process LRU first, then the shared `llm_cache`
+    collection, so identical inputs (e.g. re-uploads of the same file) reuse
+    the earlier answer across workers. Firestore errors degrade to a miss.
+    """
+
+    def __init__(self, kind: str, maxsize: int = 4096):
+        self._kind = kind
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+
+    @staticmethod
+    def key(*parts: Optional[str]) -> str:
+        key_material = "\x00".join(part or "" for part in parts)
+        return hashlib.blake2b(key_material.encode(), digest_size=16).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            return cached
+        try:
+            snapshot = await get_firestore_client().collection("llm_cache").document(key).get()
+        except Exception as e:
+            logger.warning("Failed to read LLM response cache: %s", e)
+            return None
+        cached = (snapshot.to_dict() or {}).get("response") if snapshot.exists else None
+        if cached is not None:
+            self._remember(key, cached)
+        return cached
+
+    async def set(self, key: str, response: str) -> None:
+        self._remember(key, response)
+        try:
+            await get_firestore_client().collection("llm_cache").document(key).set({
+                "kind": self._kind,
+                "response": response,
+                "created_at": firestore.SERVER_TIMESTAMP
+            })
+        except Exception as e:
+            logger.warning("Failed to write LLM response cache: %s", e)
+
+    def _remember(self, key: str, response: str) -> None:
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
@@ -0,0 +1,37 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from app.config import settings
+
+# Dedicated pool for CPU-bound request work (hashing, parsing) so it neither
+# blocks the event loop nor competes with I/O calls on the default executor
+CPU_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="cpu")
+
+# Bounded pool for the remaining blocking Cloud Storage SDK calls (URL signing).
+# Keeps them off the event loop without letting them grow the default executor.
+IO_POOL = ThreadPoolExecutor(max_workers=settings.STORAGE_IO_WORKERS, thread_name_prefix="storage-io")
+
+# Process pool for GIL-bound parsing (pdfminer text extraction is pure Python),
+# created on first use. Workers are spawned rather than forked: forking a process
+# that holds live gRPC channels and threads is unsafe.
+PROCESS_POOL_SIZE = settings.PDF_PARSE_PROCESSES or os.cpu_count() or 4
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=PROCESS_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
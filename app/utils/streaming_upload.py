@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import logging
+from typing import Callable, List, Optional
+
+from google.cloud.storage import Blob, Bucket
+from streaming_form_data.targets import BaseTarget
+from streaming_form_data.validators import MaxSizeValidator
+
+from app.utils.gcs import compose_objects, delete_object, delete_objects, upload_object
+from app.utils.pools import CPU_POOL
+
+logger = logging.getLogger("app.utils.streaming_upload")
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_CONCURRENCY = 8
+
+# Cloud Storage compose accepts at most 32 source objects per request
+_MAX_COMPOSE_SOURCES = 32
+
+
+class BlobUploadTarget(BaseTarget):
+    """streaming-form-data target that forwards a file part into Cloud Storage
+    as the bytes arrive.
+
+    Files smaller than one chunk are uploaded with a single request. Larger files
+    are split into chunk-sized part objects that are uploaded in parallel (at most
+    `concurrency` in flight, which also bounds buffered memory) and then composed
+    into the final object. An MD5 digest of the content is computed on the way
+    through for deduplication: the digest Cloud Storage records for direct
+    uploads, so both upload paths share one key space.
+
+    With `max_size` set, a file part larger than `max_size` bytes raises
+    streaming_form_data.validators.ValidationError while it is being received.
+    """
+
+    def __init__(
+        self,
+        bucket: Bucket,
+        blob_name_factory: Callable[[str], str],
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        concurrency: int = UPLOAD_CONCURRENCY,
+        max_size: Optional[int] = None,
+    ):
+        super().__init__(validator=MaxSizeValidator(max_size) if max_size else None)
+        self._bucket = bucket
+        self._blob_name_factory = blob_name_factory
+        self._chunk_size = chunk_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._buffer = bytearray()
+        self._parts: List[Blob] = []
+        # Names of intermediate composite objects (uploads of more than 32 parts)
+        self._intermediates: List[str] = []
+        self._part_tasks: List[asyncio.Task] = []
+        self._hasher = hashlib.md5(usedforsecurity=False)
+        self.blob = None
+        self.size = 0
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    @property
+    def finished(self) -> bool:
+        """True once the closing boundary was seen and the final object written."""
+        return self._finished
+
+    @property
+    def content_hash(self) -> str:
+        """Hex MD5 digest of the file part."""
+        return self._hasher.hexdigest()
+
+    async def on_start_async(self):
+        blob_name = self._blob_name_factory(self.multipart_filename or "")
+        logger.debug("Starting streamed upload for blob '%s'", blob_name)
+        self.blob = self._bucket.blob(blob_name)
+        self.blob.content_type = self.multipart_content_type
+
+    async def on_data_received_async(self, chunk: bytes):
+        self.size += len(chunk)
+        self._buffer += chunk
+        while len(self._buffer) >= self._chunk_size:
+            # Copy the part out through a memoryview so it's copied once, not sliced then copied
+            with memoryview(self._buffer) as view:
+                data = bytes(view[:self._chunk_size])
+            del self._buffer[:self._chunk_size]
+            await self._start_part(data)
+
+    async def on_finish_async(self):
+        if not self._parts:
+            data = bytes(self._buffer)
+            await asyncio.get_running_loop().run_in_executor(CPU_POOL, self._hasher.update, data)
+            await self._upload(self.blob, data)
+            self._buffer.clear()
+            logger.debug("Uploaded blob '%s' in a single request (size=%d)", self.blob.name, self.size)
+            return
+
+        if self._buffer:
+            await self._start_part(bytes(self._buffer))
+            self._buffer.clear()
+        try:
+            await asyncio.gather(*self._part_tasks)
+            await self._compose_parts()
+        finally:
+            await self._delete_parts()
+        logger.debug("Composed blob '%s' from %d parts (size=%d)", self.blob.name, len(self._parts), self.size)
+
+    async def discard(self):
+        """Abort an in-progress upload and remove any objects it created."""
+        for task in self._part_tasks:
+            task.cancel()
+        await asyncio.gather(*self._part_tasks, return_exceptions=True)
+        await self._delete_parts()
+        if self.blob is not None:
+            await delete_quietly(self.blob)
+
+    async def _start_part(self, data: bytes):
+        # Waiting for a free slot here pauses the request stream, so at most
+        # `concurrency` parts are buffered at any time
+        await self._semaphore.acquire()
+        # Parts are cut in order, so hashing them one at a time keeps the digest
+        # identical to hashing the whole file
+        await asyncio.get_running_loop().run_in_executor(CPU_POOL, self._hasher.update, data)
+        part = self._bucket.blob(f"{self.blob.name}.part-{len(self._parts):05d}")
+        self._parts.append(part)
+        self._part_tasks.append(asyncio.create_task(self._upload_part(part, data)))
+
+    async def _upload_part(self, part: Blob, data: bytes):
+        try:
+            await self._upload(part, data)
+        finally:
+            self._semaphore.release()
+
+    async def _upload(self, blob: Blob, data: bytes):
+        await upload_object(self._bucket.name, blob.name, data, self.multipart_content_type)
+
+    async def _compose_parts(self):
+        names = [part.name for part in self._parts]
+        content_type = self.multipart_content_type
+        # Compose as a tree of fresh intermediate objects rather than folding parts
+        # into the destination: no compose reads its own destination, so each one
+        # can be retried on its own
+        level = 0
+        while len(names) > _MAX_COMPOSE_SOURCES:
+            groups = [names[i:i + _MAX_COMPOSE_SOURCES] for i in range(0, len(names), _MAX_COMPOSE_SOURCES)]
+            names = [f"{self.blob.name}.compose-{level}-{i:05d}" for i in range(len(groups))]
+            self._intermediates.extend(names)
+            await asyncio.gather(*(
+                compose_objects(self._bucket.name, name, group, content_type)
+                for name, group in zip(names, groups)
+            ))
+            level += 1
+        await compose_objects(self._bucket.name, self.blob.name, names, content_type)
+
+    async def _delete_parts(self):
+        if not self._parts:
+            return
+        try:
+            await delete_objects(self._bucket.name, [part.name for part in self._parts] + self._intermediates)
+        except Exception:
+            logger.warning("Failed to delete upload parts for blob '%s'", self.blob.name, exc_info=True)
+
+
+async def delete_quietly(blob: Blob):
+    """Best-effort object delete; failures are ignored."""
+    try:
+        await delete_object(blob.bucket.name, blob.name)
+    except Exception:
+        pass
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Tuple
+
+from app.config import settings
+
+
+class DocumentTreeCache:
+    """Small TTL + LRU cache for built document trees.
+
+    Writers call `invalidate()`, which bumps a version counter and drops every
+    entry. A load that started before an invalidation is returned to its caller
+    but not stored, so a stale tree is never cached past a write.
+    """
+
+    def __init__(self, ttl_seconds: float, maxsize: int = 64):
+        self._ttl = ttl_seconds
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._version += 1
+        self._entries.clear()
+
+    def _lookup(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, version, value = entry
+        if version != self._version or expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if self._ttl <= 0:
+            return await loader()
+
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry[2]
+
+        # Only one coroutine rebuilds a missing entry; the rest wait and reuse it
+        async with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry[2]
+
+            version = self._version
+            value = await loader()
+            if version == self._version:
+                self._entries[key] = (time.monotonic() + self._ttl, version, value)
+                while len(self._entries) > self._maxsize:
+                    self._entries.popitem(last=False)
+            return value
+
+
+document_tree_cache = DocumentTreeCache(settings.DOC_TREE_CACHE_TTL_SEC)
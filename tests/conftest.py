@@ -0,0 +1,109 @@
+"""Test setup: the app talks to in-memory Firestore and Cloud Storage fakes.
+
+app.database builds its clients at import time from a service account file, so
+a throwaway one (with a freshly generated key, used only for local URL
+signing) is written before anything from the app is imported.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+def _write_test_credentials() -> str:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    fd, path = tempfile.mkstemp(prefix="document-vault-test-", suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump({
+            "type": "service_account",
+            "project_id": "document-vault-test",
+            "private_key_id": "test",
+            "private_key": pem,
+            "client_email": "tests@document-vault-test.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": "https://oauth2.googleapis.com/token",
+        }, f)
+    atexit.register(os.remove, path)
+    return path
+
+
+os.environ["FIREBASE_CREDENTIALS_PATH"] = _write_test_credentials()
+os.environ["FIREBASE_STORAGE_BUCKET"] = "document-vault-test.appspot.com"
+os.environ["FIRESTORE_CHANNEL_POOL_SIZE"] = "1"
+# No model calls from tests; LLM responses are faked where a test needs them
+os.environ["ANTHROPIC_API_KEY"] = ""
+
+import httpx  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services import document_service as document_service_module  # noqa: E402
+from app.services import folder_service, insights_service, llm_service, summarize_service  # noqa: E402
+from app.utils import common, firestore_writes, gcs, llm_cache  # noqa: E402
+from app.utils.tree_cache import document_tree_cache  # noqa: E402
+from tests.fakes import FakeFirestore, FakeStorageServer, run_transactional  # noqa: E402
+
+
+@pytest.fixture
+def firestore_db(monkeypatch) -> FakeFirestore:
+    db = FakeFirestore()
+    for module in (document_service_module, folder_service, summarize_service, insights_service, firestore_writes, llm_cache):
+        monkeypatch.setattr(module, "get_firestore_client", lambda: db)
+    monkeypatch.setattr(
+        document_service_module, "_release_content_hash",
+        run_transactional(document_service_module._release_content_hash)
+    )
+    return db
+
+
+@pytest.fixture
+def storage(monkeypatch) -> FakeStorageServer:
+    server = FakeStorageServer()
+    client = httpx.AsyncClient(transport=server.transport())
+
+    async def auth_headers():
+        return {"Authorization": "Bearer test"}
+
+    monkeypatch.setattr(gcs, "get_storage_async_http", lambda: client)
+    monkeypatch.setattr(gcs, "get_storage_auth_headers", auth_headers)
+    monkeypatch.setattr(gcs, "_INITIAL_BACKOFF_SEC", 0.001)
+    return server
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Per-process caches and service singletons start empty in every test."""
+    for module, attribute in (
+        (summarize_service, "_summarize_service_instance"),
+        (insights_service, "_insights_service_instance"),
+        (folder_service, "_folder_service_instance"),
+        (document_service_module, "_document_service_instance"),
+        (llm_service, "_llm_service_instance"),
+    ):
+        monkeypatch.setattr(module, attribute, None)
+    monkeypatch.setattr(common, "_parsed_text_cache", type(common._parsed_text_cache)())
+    monkeypatch.setattr(common, "_parsed_text_cache_chars", 0)
+    document_tree_cache.invalidate()
+    document_service_module._signed_download_url.cache_clear()
+    yield
+
+
+@pytest.fixture
+def document_service(firestore_db, storage):
+    return document_service_module.DocumentService()
+
+
+@pytest.fixture
+def small_uploads(monkeypatch):
+    """1 MB upload parts and a 4 MB size cap, so multipart paths run on small files."""
+    monkeypatch.setattr(settings, "GCS_UPLOAD_CHUNK_MB", 1)
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 4)
@@ -0,0 +1,290 @@
+"""In-memory stand-ins for the Firestore AsyncClient and the Cloud Storage JSON API.
+
+They implement just the calls the services make, with the same semantics
+(create() conflicts, update() on a missing document, Increment, SERVER_TIMESTAMP,
+conditional downloads, batch deletes), so tests exercise the real service code.
+"""
+
+import base64
+import hashlib
+import json
+import re
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+import httpx
+from google.cloud import firestore
+from google.cloud.exceptions import Conflict, NotFound
+
+
+# ------------------------------- Firestore ------------------------------- #
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return (self._data or {}).get(field)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeFirestore", collection: str, document_id: str):
+        self._client = client
+        self._collection = collection
+        self.id = document_id
+        self.path = f"{collection}/{document_id}"
+
+    @property
+    def _documents(self) -> Dict[str, Dict[str, Any]]:
+        return self._client.data.setdefault(self._collection, {})
+
+    def _resolve(self, data: Dict[str, Any], current: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        resolved = {}
+        for field, value in data.items():
+            if value is firestore.SERVER_TIMESTAMP:
+                value = now
+            elif isinstance(value, firestore.Increment):
+                value = current.get(field, 0) + value.value
+            resolved[field] = value
+        return resolved
+
+    async def set(self, data: Dict[str, Any], merge: bool = False):
+        now = datetime.now(timezone.utc)
+        current = self._documents.get(self.id, {})
+        resolved = self._resolve(data, current, now)
+        self._documents[self.id] = {**current, **resolved} if merge else resolved
+        return SimpleNamespace(update_time=now)
+
+    async def create(self, data: Dict[str, Any]):
+        if self.id in self._documents:
+            raise Conflict(f"Document already exists: {self.path}")
+        return await self.set(data)
+
+    async def update(self, data: Dict[str, Any]):
+        if self.id not in self._documents:
+            raise NotFound(f"No document to update: {self.path}")
+        return await self.set(data, merge=True)
+
+    async def get(self, field_paths=None, transaction=None) -> FakeSnapshot:
+        return FakeSnapshot(self, self._documents.get(self.id))
+
+    async def delete(self):
+        self._documents.pop(self.id, None)
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeFirestore", collection: str, filters=(), order=None, after=None, limit=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._order = order
+        self._after = after
+        self._limit = limit
+
+    def _copy(self, **changes) -> "FakeQuery":
+        state = dict(filters=self._filters, order=self._order, after=self._after, limit=self._limit)
+        state.update(changes)
+        return FakeQuery(self._client, self._collection, **state)
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        assert op == "==", f"unsupported operator {op}"
+        return self._copy(filters=self._filters + ((field, value),))
+
+    def select(self, field_paths) -> "FakeQuery":
+        return self
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeQuery":
+        return self._copy(order=(field, direction == "DESCENDING"))
+
+    def start_after(self, snapshot: FakeSnapshot) -> "FakeQuery":
+        return self._copy(after=snapshot.id)
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(limit=count)
+
+    async def stream(self):
+        documents = self._client.data.get(self._collection, {})
+        rows = [
+            (document_id, data) for document_id, data in list(documents.items())
+            if all(data.get(field) == value for field, value in self._filters)
+        ]
+        if self._order:
+            field, descending = self._order
+            rows.sort(key=lambda row: row[1].get(field), reverse=descending)
+        if self._after is not None:
+            ids = [document_id for document_id, _ in rows]
+            rows = rows[ids.index(self._after) + 1:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        for document_id, data in rows:
+            yield FakeSnapshot(FakeDocumentReference(self._client, self._collection, document_id), dict(data))
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client: "FakeFirestore", collection: str):
+        super().__init__(client, collection)
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "FakeFirestore"):
+        self._client = client
+        self._writes: List[Tuple[FakeDocumentReference, Dict[str, Any], bool]] = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False):
+        self._writes.append((reference, data, merge))
+
+    async def commit(self, retry=None):
+        if self._client.fail_commits:
+            raise self._client.fail_commits.pop(0)
+        return [await reference.set(data, merge=merge) for reference, data, merge in self._writes]
+
+
+class FakeTransaction:
+    def delete(self, reference: FakeDocumentReference):
+        reference._documents.pop(reference.id, None)
+
+
+class FakeFirestore:
+    """Stores documents as `data[collection][document_id] = fields`."""
+
+    def __init__(self):
+        self.data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Exceptions raised by the next WriteBatch commits, in order
+        self.fail_commits: List[Exception] = []
+        self.get_all_calls: List[List[str]] = []
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction()
+
+    async def get_all(self, references, field_paths=None):
+        self.get_all_calls.append([reference.path for reference in references])
+        for reference in references:
+            yield await reference.get()
+
+
+def run_transactional(transactional: Callable) -> Callable:
+    """Run an @async_transactional function's body directly against FakeTransaction."""
+    async def run(transaction, *args, **kwargs):
+        return await transactional.to_wrap(transaction, *args, **kwargs)
+    return run
+
+
+# ----------------------------- Cloud Storage ----------------------------- #
+
+class FakeStorageObject:
+    def __init__(self, data: bytes, content_type: str, generation: int, md5: bool = True):
+        self.data = data
+        self.content_type = content_type
+        self.generation = generation
+        # Composite objects carry no MD5, like in Cloud Storage
+        self.md5_hash = base64.b64encode(hashlib.md5(data).digest()).decode() if md5 else None
+
+
+class FakeStorageServer:
+    """Serves the Cloud Storage JSON API endpoints used by app.utils.gcs.
+
+    `fault` may return a response (or raise) to inject a failure for a request;
+    returning None lets the request through.
+    """
+
+    def __init__(self):
+        self.objects: Dict[str, FakeStorageObject] = {}
+        self.requests: List[httpx.Request] = []
+        self.fault: Optional[Callable[[httpx.Request], Optional[httpx.Response]]] = None
+        self._generation = 0
+
+    def put(self, name: str, data: bytes, content_type: str = "application/octet-stream", md5: bool = True) -> None:
+        self._generation += 1
+        self.objects[name] = FakeStorageObject(data, content_type, self._generation, md5)
+
+    def data(self, name: str) -> bytes:
+        return self.objects[name].data
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self._handle)
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.fault is not None:
+            response = self.fault(request)
+            if response is not None:
+                return response
+
+        path = request.url.path
+        if request.method == "POST" and path.startswith("/upload/"):
+            self.put(request.url.params["name"], request.content, request.headers.get("content-type", ""))
+            return httpx.Response(200, json={})
+        if request.method == "POST" and path == "/batch/storage/v1":
+            for match in re.finditer(r"DELETE /storage/v1/b/[^/]+/o/(\S+) HTTP", request.content.decode()):
+                self.objects.pop(unquote(match.group(1)), None)
+            return httpx.Response(200, text="")
+
+        # Object names are percent-encoded into a single path segment
+        object_path = request.url.raw_path.decode().split("?", 1)[0].split("/o/", 1)[1]
+        if request.method == "POST" and object_path.endswith("/compose"):
+            body = json.loads(request.content)
+            sources = [self.objects[source["name"]].data for source in body["sourceObjects"]]
+            name = unquote(object_path[:-len("/compose")])
+            self.put(name, b"".join(sources), body["destination"]["contentType"], md5=False)
+            return httpx.Response(200, json={})
+
+        name = unquote(object_path)
+
+        stored = self.objects.get(name)
+        if stored is None:
+            return httpx.Response(404, json={"error": {"message": "No such object"}})
+        if request.method == "DELETE":
+            del self.objects[name]
+            return httpx.Response(204)
+        if request.url.params.get("alt") != "media":
+            resource = {"name": name, "size": str(len(stored.data)), "contentType": stored.content_type}
+            if stored.md5_hash:
+                resource["md5Hash"] = stored.md5_hash
+            return httpx.Response(200, json=resource)
+        if request.url.params.get("ifGenerationNotMatch") == str(stored.generation):
+            return httpx.Response(304)
+        return httpx.Response(
+            200,
+            content=stored.data,
+            headers={"content-type": stored.content_type, "x-goog-generation": str(stored.generation)},
+        )
+
+
+# ------------------------------- Requests -------------------------------- #
+
+def multipart_body(fields: Dict[str, str], files: Dict[str, Tuple[str, str, bytes]], boundary: str = "testboundary"):
+    """Return (headers, body) of a multipart/form-data request."""
+    body = b""
+    for name, value in fields.items():
+        body += f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+    for name, (filename, content_type, data) in files.items():
+        body += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode() + data + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return {"content-type": f"multipart/form-data; boundary={boundary}"}, body
+
+
+async def stream_chunks(data: bytes, chunk_size: int = 64 * 1024):
+    """Yield `data` in pieces, like a request body arriving over the network."""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
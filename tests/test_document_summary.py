@@ -0,0 +1,263 @@
+"""Summary generation: background scheduling, caching, parsed-text reuse and the LLM calls."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi import BackgroundTasks
+
+from app.config import settings
+from app.services import document_service as document_service_module
+from app.services import llm_service
+from app.services.llm_service import LLMService
+from app.services.summarize_service import SummarizeService
+from app.utils import common
+
+DOCUMENT_TEXT = "Policy holder: Jane Doe. Premium $1,200.00 due 01/02/2024. Coverage includes fire and flood."
+
+
+def _add_document(firestore_db, document_id: str = "doc-1", filename: str = "notes.txt"):
+    firestore_db.data.setdefault("documents", {})[document_id] = {
+        "filename": filename,
+        "original_filename": filename,
+        "storage_path": f"gs://{settings.FIREBASE_STORAGE_BUCKET}/{filename}",
+        "is_active": True,
+    }
+
+
+class FakeLLM:
+    """Stands in for LLMService on the summarize service; records what it was asked."""
+
+    model = "fake-model"
+    available = True
+
+    def __init__(self):
+        self.summaries = []
+        self.batches = []
+
+    async def request_summary(self, text, filename):
+        self.summaries.append(text)
+        return f"realtime summary {len(self.summaries)}"
+
+    async def summarize_batch(self, documents):
+        self.batches.append([custom_id for custom_id, _, _ in documents])
+        return {custom_id: f"batch summary of {custom_id}" for custom_id, _, _ in documents}
+
+    def fallback_summary(self, text, filename):
+        return "fallback summary"
+
+
+# ------------------------------ Request flow ------------------------------ #
+
+def test_missing_summary_is_generated_once_in_the_background(document_service, storage, firestore_db):
+    _add_document(firestore_db)
+    storage.put("notes.txt", DOCUMENT_TEXT.encode(), "text/plain")
+
+    async def request_twice():
+        first_tasks, second_tasks = BackgroundTasks(), BackgroundTasks()
+        first = await document_service.get_document_summary("doc-1", first_tasks)
+        second = await document_service.get_document_summary("doc-1", second_tasks)
+        return first, second, first_tasks, second_tasks
+
+    first, second, first_tasks, second_tasks = asyncio.run(request_twice())
+
+    assert first.summary == second.summary == document_service_module._SUMMARY_PENDING_MESSAGE
+    assert len(first_tasks.tasks) == 1 and not second_tasks.tasks
+    assert firestore_db.data["document_summary_progress"]["doc-1"]["status"] == "generating"
+
+    asyncio.run(first_tasks())
+
+    assert firestore_db.data["document_summary_progress"]["doc-1"]["status"] == "completed"
+    stored = firestore_db.data["document_summaries"]["doc-1"]["summary_text"]
+    assert stored and stored != document_service_module._SUMMARY_PENDING_MESSAGE
+    # Insights are precomputed once the summary exists
+    assert "doc-1" in firestore_db.data["document_insights"]
+
+
+def test_stored_summary_is_served_from_memory_on_repeat_reads(document_service, firestore_db):
+    _add_document(firestore_db)
+    now = datetime.now(timezone.utc)
+    firestore_db.data["document_summaries"] = {"doc-1": {
+        "document_id": "doc-1", "summary_text": "stored summary", "created_at": now, "updated_at": now
+    }}
+
+    async def read_twice():
+        return [await document_service.get_document_summary("doc-1", BackgroundTasks()) for _ in range(2)]
+
+    responses = asyncio.run(read_twice())
+
+    assert [response.summary for response in responses] == ["stored summary", "stored summary"]
+    assert len(firestore_db.get_all_calls[0]) == 3
+    assert firestore_db.get_all_calls[1] == ["documents/doc-1"]
+
+
+def test_failed_generation_can_be_claimed_again(document_service, storage, firestore_db):
+    _add_document(firestore_db)
+
+    async def request_generation():
+        background_tasks = BackgroundTasks()
+        await document_service.get_document_summary("doc-1", background_tasks)
+        await background_tasks()
+        return background_tasks
+
+    # The object is missing, so the first attempt fails
+    first = asyncio.run(request_generation())
+    assert firestore_db.data["document_summary_progress"]["doc-1"]["status"] == "failed"
+
+    storage.put("notes.txt", DOCUMENT_TEXT.encode(), "text/plain")
+    second = asyncio.run(request_generation())
+
+    assert len(first.tasks) == len(second.tasks) == 1
+    assert firestore_db.data["document_summary_progress"]["doc-1"]["status"] == "completed"
+
+
+def test_update_of_a_summary_without_created_at(firestore_db):
+    firestore_db.data["document_summaries"] = {"doc-1": {"document_id": "doc-1", "summary_text": "old"}}
+
+    updated = asyncio.run(SummarizeService().update_document_summary("doc-1", "new"))
+
+    assert updated.summary_text == "new"
+    assert updated.created_at == updated.updated_at
+    assert firestore_db.data["document_summaries"]["doc-1"]["summary_text"] == "new"
+
+
+# ------------------------------ Parsed text ------------------------------ #
+
+def test_unchanged_blob_text_is_reused_without_a_download(storage, monkeypatch):
+    parsed = []
+    parse_blob_text = common.parse_blob_text
+
+    def counting_parse(blob_name, content_type, file_bytes):
+        parsed.append(blob_name)
+        return parse_blob_text(blob_name, content_type, file_bytes)
+
+    monkeypatch.setattr(common, "parse_blob_text", counting_parse)
+    storage.put("notes.txt", b"first version", "text/plain")
+
+    async def read(expected: str):
+        assert await common.download_blob_text_async("notes.txt") == expected
+
+    asyncio.run(read("first version"))
+    asyncio.run(read("first version"))
+    storage.put("notes.txt", b"second version", "text/plain")
+    asyncio.run(read("second version"))
+
+    generations = [request.url.params.get("ifGenerationNotMatch") for request in storage.requests]
+    assert generations == [None, "1", "1"]
+    assert parsed == ["notes.txt", "notes.txt"]
+
+
+# ------------------------------ LLM calls ------------------------------ #
+
+def _message(text: str):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)])
+
+
+def test_long_documents_are_summarized_by_map_reduce():
+    service = LLMService(api_key="test-key")
+    calls = []
+
+    async def create(**params):
+        calls.append(params)
+        return _message(f"notes {len(calls)}")
+
+    service._client = SimpleNamespace(messages=SimpleNamespace(create=create))
+    text = "".join(f"word{i} " for i in range(10000))
+
+    summary = asyncio.run(service.request_summary(text, "long.pdf"))
+
+    chunk_calls, combine_call = calls[:-1], calls[-1]
+    assert len(chunk_calls) > 1
+    assert all(call["system"] is llm_service.chunk_system_prompt for call in chunk_calls)
+    assert combine_call["system"] is llm_service.system_prompt
+    assert "SECTION 1 NOTES" in combine_call["messages"][0]["content"]
+    assert summary == f"notes {len(calls)}"
+
+    calls.clear()
+    asyncio.run(service.request_summary("short document " * 50, "short.pdf"))
+    assert len(calls) == 1
+
+
+def test_batch_summaries_go_through_the_message_batches_api(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BATCH_POLL_SEC", 0)
+    service = LLMService(api_key="test-key")
+
+    class BatchesClient:
+        def __init__(self):
+            self.requests = []
+            self.polls = 0
+
+        async def post(self, path, cast_to, body):
+            assert path == "/v1/messages/batches"
+            self.requests = body["requests"]
+            return {"id": "batch-1", "processing_status": "in_progress"}
+
+        async def get(self, path, cast_to):
+            if path.endswith("/results"):
+                return "\n".join(json.dumps({
+                    "custom_id": request["custom_id"],
+                    "result": {"type": "succeeded", "message": {"content": [{"type": "text", "text": f"summary {request['custom_id']}"}]}}
+                    if request["custom_id"] != "bad" else {"type": "errored"},
+                }) for request in self.requests)
+            self.polls += 1
+            return {"id": "batch-1", "processing_status": "ended" if self.polls == 2 else "in_progress"}
+
+    client = BatchesClient()
+    service._client = client
+
+    summaries = asyncio.run(service.summarize_batch([
+        ("a", "first document", "a.pdf"),
+        ("empty", "   ", "empty.pdf"),
+        ("bad", "second document", "b.pdf"),
+    ]))
+
+    assert [request["custom_id"] for request in client.requests] == ["a", "bad"]
+    assert client.polls == 2
+    assert summaries == {"a": "summary a"}
+
+
+def test_batch_and_realtime_summaries_are_cached_separately(firestore_db):
+    service = SummarizeService()
+    service.llm_service = FakeLLM()
+    # Longer than the batch excerpt, so the two paths show the model different input
+    text = "clause " * 5000
+
+    async def summarize():
+        batch = await service.generate_document_summaries([("doc-1", text, "long.pdf")])
+        batch_again = await service.generate_document_summaries([("doc-1", text, "long.pdf")])
+        realtime = await service.generate_document_summary(text, "long.pdf")
+        realtime_again = await service.generate_document_summary(text, "long.pdf")
+        return batch, batch_again, realtime, realtime_again
+
+    batch, batch_again, realtime, realtime_again = asyncio.run(summarize())
+
+    assert batch == batch_again == {"doc-1": "batch summary of doc-1"}
+    assert realtime == realtime_again == "realtime summary 1"
+    assert service.llm_service.batches == [["doc-1"]]
+    assert len(service.llm_service.summaries) == 1
+
+
+def test_batch_generation_stores_summaries_and_outcomes(document_service, storage, firestore_db):
+    _add_document(firestore_db, "doc-1", "one.txt")
+    _add_document(firestore_db, "doc-2", "two.txt")
+    _add_document(firestore_db, "doc-3", "missing.txt")
+    _add_document(firestore_db, "inactive", "three.txt")
+    firestore_db.data["documents"]["inactive"]["is_active"] = False
+    storage.put("one.txt", b"first document", "text/plain")
+    storage.put("two.txt", b"second document", "text/plain")
+    document_service.summarize_service.llm_service = FakeLLM()
+
+    asyncio.run(document_service.generate_summaries_batch(["doc-1", "doc-2", "doc-3", "inactive", "doc-1"]))
+
+    assert document_service.summarize_service.llm_service.batches == [["doc-1", "doc-2"]]
+    summaries = firestore_db.data["document_summaries"]
+    assert {document_id: row["summary_text"] for document_id, row in summaries.items()} == {
+        "doc-1": "batch summary of doc-1",
+        "doc-2": "batch summary of doc-2",
+    }
+    progress = firestore_db.data["document_summary_progress"]
+    assert {document_id: row["status"] for document_id, row in progress.items()} == {
+        "doc-1": "completed", "doc-2": "completed", "doc-3": "failed"
+    }
+    assert progress["doc-3"]["error"] == "No text content extracted"
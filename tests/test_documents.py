@@ -0,0 +1,338 @@
+"""Uploads, content-hash deduplication, the document tree cache and folder listings."""
+
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from google.api_core.exceptions import ServiceUnavailable
+from streaming_form_data import StreamingFormDataParser
+
+from app.schemas.document import DocumentUploadInitiate
+from app.services.document_service import _content_hash_key
+from app.utils.streaming_upload import BlobUploadTarget
+from app.utils.tree_cache import DocumentTreeCache
+from tests.fakes import multipart_body, stream_chunks
+
+MB = 1024 * 1024
+
+
+def _file_bytes(size: int, seed: int = 0) -> bytes:
+    pattern = bytes((seed + i) % 256 for i in range(256))
+    return (pattern * (size // 256 + 1))[:size]
+
+
+def _upload(service, data: bytes, filename: str = "reports/report.pdf", folder_id: str = "folder-1", body_cut: int = 0):
+    headers, body = multipart_body(
+        {"meta_data": f'{{"current_folder_id": "{folder_id}"}}'},
+        {"file": (filename, "application/pdf", data)},
+    )
+    if body_cut:
+        body = body[:-body_cut]
+    return asyncio.run(service.create_document(headers, stream_chunks(body)))
+
+
+def _upload_requests(storage):
+    return [request for request in storage.requests if request.url.path.startswith("/upload/")]
+
+
+# ------------------------------ Streamed uploads ------------------------------ #
+
+def test_small_upload_is_stored_with_a_single_request(document_service, storage, firestore_db):
+    data = _file_bytes(1000)
+
+    document = _upload(document_service, data)
+
+    assert list(storage.objects) == [document.filename]
+    assert storage.data(document.filename) == data
+    assert len(_upload_requests(storage)) == 1
+    record = firestore_db.data["documents"][document.id]
+    assert record["file_size"] == len(data)
+    assert record["folder_id"] == "folder-1"
+    assert record["content_hash"] == _content_hash_key(hashlib.md5(data).hexdigest())
+    assert firestore_db.data["content_hashes"][record["content_hash"]]["filename"] == document.filename
+
+
+def test_large_upload_is_sent_as_parallel_parts_and_composed(document_service, storage, small_uploads):
+    data = _file_bytes(3 * MB + 123)
+
+    document = _upload(document_service, data)
+
+    # Four 1 MB parts, composed into the final object and then removed
+    assert len(_upload_requests(storage)) == 4
+    assert list(storage.objects) == [document.filename]
+    assert storage.data(document.filename) == data
+
+
+def test_uploads_of_more_than_32_parts_compose_through_intermediate_objects(document_service, storage):
+    data = _file_bytes(70 * 1024 + 5)
+    target = BlobUploadTarget(document_service._bucket, lambda name: "big.pdf", chunk_size=1024, concurrency=4)
+    headers, body = multipart_body({}, {"file": ("big.pdf", "application/pdf", data)})
+
+    async def upload():
+        parser = StreamingFormDataParser(headers=headers)
+        parser.register("file", target)
+        async for chunk in stream_chunks(body, 4096):
+            await parser.adata_received(chunk)
+
+    asyncio.run(upload())
+
+    assert target.finished
+    assert target.content_hash == hashlib.md5(data).hexdigest()
+    assert storage.data("big.pdf") == data
+    # 71 parts: three intermediates at the first level, all removed afterwards
+    composed = [request.url.path for request in storage.requests if request.url.path.endswith("/compose")]
+    assert len(composed) == 4
+    assert list(storage.objects) == ["big.pdf"]
+
+
+def test_oversized_upload_is_rejected_and_its_parts_removed(document_service, storage, firestore_db, small_uploads):
+    with pytest.raises(HTTPException) as excinfo:
+        _upload(document_service, _file_bytes(5 * MB))
+
+    assert excinfo.value.status_code == 413
+    assert storage.objects == {}
+    assert "documents" not in firestore_db.data
+    assert "content_hashes" not in firestore_db.data
+
+
+def test_truncated_multipart_body_is_rejected(document_service, storage, firestore_db, small_uploads):
+    # Drop the closing boundary and the tail of the file part
+    with pytest.raises(HTTPException) as excinfo:
+        _upload(document_service, _file_bytes(2 * MB + 10), body_cut=100)
+
+    assert excinfo.value.status_code == 400
+    assert storage.objects == {}
+    assert "content_hashes" not in firestore_db.data
+
+
+def test_part_uploads_are_retried_on_transient_failures(document_service, storage, small_uploads):
+    attempts = {}
+
+    def flaky(request):
+        if not request.url.path.startswith("/upload/"):
+            return None
+        name = request.url.params["name"]
+        attempts[name] = attempts.get(name, 0) + 1
+        if attempts[name] == 1:
+            return httpx.Response(503)
+        if attempts[name] == 2:
+            raise httpx.ReadError("connection reset")
+        return None
+
+    storage.fault = flaky
+    data = _file_bytes(3 * MB + 1)
+
+    document = _upload(document_service, data)
+
+    assert storage.data(document.filename) == data
+    assert list(storage.objects) == [document.filename]
+    assert len(attempts) == 4 and set(attempts.values()) == {3}
+
+
+def test_part_upload_failure_after_retries_aborts_the_upload(document_service, storage, small_uploads):
+    storage.fault = lambda request: httpx.Response(500) if request.url.path.startswith("/upload/") else None
+
+    with pytest.raises(HTTPException) as excinfo:
+        _upload(document_service, _file_bytes(2 * MB + 1))
+
+    assert excinfo.value.status_code == 502
+    assert storage.objects == {}
+
+
+# ------------------------------ Deduplication ------------------------------ #
+
+def test_identical_streamed_upload_reuses_the_stored_object(document_service, storage, firestore_db):
+    data = _file_bytes(5000)
+
+    first = _upload(document_service, data)
+    second = _upload(document_service, data, filename="copy.pdf")
+
+    assert second.id != first.id
+    assert second.filename == first.filename
+    assert list(storage.objects) == [first.filename]
+    content_hash = firestore_db.data["documents"][first.id]["content_hash"]
+    assert firestore_db.data["content_hashes"][content_hash]["reuse_count"] == 1
+
+
+def test_direct_upload_dedupes_against_a_streamed_upload(document_service, storage, firestore_db):
+    data = _file_bytes(5000, seed=7)
+    streamed = _upload(document_service, data)
+
+    async def direct_upload():
+        initiated = await document_service.create_document_initiate(
+            DocumentUploadInitiate(original_filename="direct.pdf", content_type="application/pdf", current_folder_id="folder-1")
+        )
+        storage.put(initiated.filename, data, "application/pdf")
+        return initiated, await document_service.create_document_finalize(initiated.id)
+
+    initiated, finalized = asyncio.run(direct_upload())
+
+    assert finalized.filename == streamed.filename
+    assert finalized.is_active
+    assert initiated.filename not in storage.objects
+    record = firestore_db.data["documents"][initiated.id]
+    assert record["content_hash"] == firestore_db.data["documents"][streamed.id]["content_hash"]
+
+
+def test_oversized_direct_upload_is_rejected_on_finalize(document_service, storage, firestore_db, small_uploads):
+    async def direct_upload():
+        initiated = await document_service.create_document_initiate(
+            DocumentUploadInitiate(original_filename="big.pdf", content_type="application/pdf")
+        )
+        assert initiated.upload_headers == {"x-goog-content-length-range": f"0,{4 * MB}"}
+        storage.put(initiated.filename, _file_bytes(5 * MB), "application/pdf")
+        await document_service.create_document_finalize(initiated.id)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(direct_upload())
+
+    assert excinfo.value.status_code == 413
+    assert storage.objects == {}
+    assert "content_hashes" not in firestore_db.data
+
+
+def test_rollback_releases_an_unreused_claim_and_its_object(document_service, storage, firestore_db):
+    storage.put("a.pdf", b"a")
+
+    async def claim_and_release():
+        assert await document_service._claim_content_hash("md5-a", "a.pdf") is None
+        await document_service._release_upload("md5-a", document_service._bucket.blob("a.pdf"))
+
+    asyncio.run(claim_and_release())
+
+    assert "a.pdf" not in storage.objects
+    assert "md5-a" not in firestore_db.data["content_hashes"]
+
+
+def test_rollback_keeps_an_object_another_upload_reuses(document_service, storage, firestore_db):
+    storage.put("b.pdf", b"b")
+    storage.put("c.pdf", b"b")
+
+    async def claim_twice_and_release():
+        assert await document_service._claim_content_hash("md5-b", "b.pdf") is None
+        existing = await document_service._claim_content_hash("md5-b", "c.pdf")
+        assert existing["filename"] == "b.pdf" and existing["reuse_count"] == 1
+        await document_service._release_upload("md5-b", document_service._bucket.blob("b.pdf"))
+        # An upload that never held the claim only removes its own object
+        await document_service._release_upload("md5-b", document_service._bucket.blob("c.pdf"))
+
+    asyncio.run(claim_twice_and_release())
+
+    assert "b.pdf" in storage.objects and "c.pdf" not in storage.objects
+    assert firestore_db.data["content_hashes"]["md5-b"]["filename"] == "b.pdf"
+
+
+def test_failed_metadata_commit_rolls_back_the_upload(document_service, storage, firestore_db):
+    firestore_db.fail_commits.append(ServiceUnavailable("firestore down"))
+
+    with pytest.raises(HTTPException) as excinfo:
+        _upload(document_service, _file_bytes(2000))
+
+    assert excinfo.value.status_code == 502
+    assert storage.objects == {}
+    assert firestore_db.data["content_hashes"] == {}
+
+
+def test_failed_commit_of_a_duplicate_keeps_the_original_object(document_service, storage, firestore_db):
+    data = _file_bytes(2000, seed=3)
+    original = _upload(document_service, data)
+    firestore_db.fail_commits.append(ServiceUnavailable("firestore down"))
+
+    with pytest.raises(HTTPException):
+        _upload(document_service, data, filename="again.pdf")
+
+    assert list(storage.objects) == [original.filename]
+    assert original.id in firestore_db.data["documents"]
+
+
+# ------------------------------ Tree and listings ------------------------------ #
+
+def _add_document(firestore_db, document_id: str, folder_id: str, created_at: datetime, is_active: bool = True):
+    firestore_db.data.setdefault("documents", {})[document_id] = {
+        "original_filename": f"{document_id}.pdf",
+        "filename": f"{document_id}.pdf",
+        "file_type": ".pdf",
+        "storage_path": None,
+        "folder_id": folder_id,
+        "created_at": created_at,
+        "is_active": is_active,
+    }
+
+
+def _tree_file_ids(tree):
+    ids = []
+    for node in tree:
+        if node["type"] == "file":
+            ids.append(node["id"])
+        else:
+            ids.extend(_tree_file_ids(node["children"]))
+    return sorted(ids)
+
+
+def test_document_tree_is_cached_until_a_document_is_created(document_service, firestore_db):
+    now = datetime.now(timezone.utc)
+    firestore_db.data["folders"] = {"folder-1": {"name": "Docs", "parent_id": None, "created_at": now, "is_active": True}}
+    _add_document(firestore_db, "doc-1", "folder-1", now)
+
+    first = asyncio.run(document_service.get_documents())
+    _add_document(firestore_db, "doc-2", "folder-1", now)
+    cached = asyncio.run(document_service.get_documents())
+    uploaded = _upload(document_service, _file_bytes(100))
+    refreshed = asyncio.run(document_service.get_documents())
+
+    assert _tree_file_ids(first) == ["doc-1"]
+    assert cached is first
+    assert _tree_file_ids(refreshed) == sorted(["doc-1", "doc-2", uploaded.id])
+
+
+def test_tree_loaded_across_an_invalidation_is_not_cached():
+    cache = DocumentTreeCache(ttl_seconds=60)
+    loads = []
+
+    async def load_during_write():
+        loads.append("stale")
+        # A write lands while the tree is being built
+        cache.invalidate()
+        return "stale"
+
+    async def load():
+        loads.append("fresh")
+        return "fresh"
+
+    async def run():
+        assert await cache.get_or_load("root", load_during_write) == "stale"
+        assert await cache.get_or_load("root", load) == "fresh"
+        assert await cache.get_or_load("root", load) == "fresh"
+
+    asyncio.run(run())
+
+    assert loads == ["stale", "fresh"]
+
+
+def test_folder_listing_pages_through_active_documents_newest_first(document_service, firestore_db):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(5):
+        _add_document(firestore_db, f"doc-{i}", "folder-1", start + timedelta(days=i))
+    _add_document(firestore_db, "deleted", "folder-1", start + timedelta(days=9), is_active=False)
+    _add_document(firestore_db, "elsewhere", "folder-2", start + timedelta(days=9))
+
+    async def list_all():
+        pages, cursor = [], None
+        while True:
+            page = await document_service.list_folder_documents("folder-1", cursor=cursor, limit=2)
+            pages.append([item["id"] for item in page["items"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+
+    assert asyncio.run(list_all()) == [["doc-4", "doc-3"], ["doc-2", "doc-1"], ["doc-0"]]
+
+
+def test_folder_listing_rejects_an_unknown_cursor(document_service, firestore_db):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(document_service.list_folder_documents("folder-1", cursor="missing"))
+
+    assert excinfo.value.status_code == 400
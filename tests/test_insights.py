@@ -0,0 +1,87 @@
+"""Insights: background generation from the summary, caching and the heuristic fallback."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi import BackgroundTasks
+
+from app.services import document_service as document_service_module
+from app.services.llm_service import LLMService
+
+
+def _add_document(firestore_db, summary_text=None):
+    firestore_db.data["documents"] = {"doc-1": {
+        "filename": "policy.txt",
+        "storage_path": "gs://bucket/policy.txt",
+        "is_active": True,
+    }}
+    if summary_text:
+        now = datetime.now(timezone.utc)
+        firestore_db.data["document_summaries"] = {"doc-1": {
+            "document_id": "doc-1", "summary_text": summary_text, "created_at": now, "updated_at": now
+        }}
+
+
+def test_insights_wait_for_a_pending_summary(document_service, firestore_db):
+    _add_document(firestore_db)
+    background_tasks = BackgroundTasks()
+
+    response = asyncio.run(document_service.get_document_insights("doc-1", background_tasks))
+
+    assert response.insights.document_type == "unknown"
+    assert response.insights.key_insights.critical_information == [document_service_module._INSIGHTS_PENDING_MESSAGE]
+    # Only the summary is scheduled; it goes on to generate the insights
+    assert [task.func for task in background_tasks.tasks] == [document_service._generate_summary_background]
+
+
+def test_insights_are_generated_in_the_background_then_cached(document_service, firestore_db):
+    _add_document(firestore_db, summary_text="Insurance policy with Premium $1,200.00 due 01/02/2024.")
+
+    async def request(background_tasks):
+        return await document_service.get_document_insights("doc-1", background_tasks)
+
+    first_tasks = BackgroundTasks()
+    pending = asyncio.run(request(first_tasks))
+    assert pending.insights.key_insights.critical_information == [document_service_module._INSIGHTS_PENDING_MESSAGE]
+    assert len(first_tasks.tasks) == 1
+    asyncio.run(first_tasks())
+
+    stored = json.loads(firestore_db.data["document_insights"]["doc-1"]["insights_data"])
+    firestore_db.get_all_calls.clear()
+    second_tasks = BackgroundTasks()
+    cached = asyncio.run(request(second_tasks))
+
+    assert not second_tasks.tasks
+    assert cached.insights.document_type == stored["document_type"] == "insurance_policy"
+    # Generation remembered the insights, so only the document itself is read
+    assert firestore_db.get_all_calls == [["documents/doc-1"]]
+
+
+def test_fallback_insights_extract_amounts_and_dates():
+    service = LLMService(api_key="")
+
+    insights = json.loads(service.fallback_insights("Premium $1,200.00 due 01/02/2024, COVERAGE ok, cost 50", "policy.pdf"))
+
+    financial_data = insights["key_insights"]["financial_data"]
+    assert [amount["value"] for amount in financial_data["amounts"]] == ["$1,200.00", "Premium $1,200.00", "cost 50"]
+    assert [date["date"] for date in financial_data["dates"]] == ["01/02/2024"]
+
+
+def test_model_insights_are_validated_before_use():
+    service = LLMService(api_key="test-key")
+    replies = ['```json\n{"document_type": "invoice", "confidence_score": 0.9}\n```', "not json"]
+
+    async def create(**params):
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=replies.pop(0))])
+
+    service._client = SimpleNamespace(messages=SimpleNamespace(create=create))
+
+    async def request_twice():
+        return [await service.request_insights("An invoice.", "invoice.pdf") for _ in range(2)]
+
+    fenced, unusable = asyncio.run(request_twice())
+
+    assert json.loads(fenced)["document_type"] == "invoice"
+    assert unusable is None